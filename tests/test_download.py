@@ -0,0 +1,76 @@
+"""
+This is a part of Python Package Manager
+
+Errors of wheel downloads against a local server. A file missing on the
+index is a broken release, any other failure has to stop the install
+
+(c) tankalxat34
+"""
+
+import asyncio
+import io
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.pypi_api import client, urllib3
+from utils.pypi_api.aio import AsyncPyPi
+from utils.pypi_api.async_client import AsyncHttpClient
+from utils.pypi_api.main import PyPi
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """Responds with the status given by the path, `/503` gets 503"""
+
+    def do_GET(self):
+        self.send_response(int(self.path.strip("/")))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloadErrorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        backoff = client.PPM_BACKOFF_FACTOR
+        client.PPM_BACKOFF_FACTOR = 0
+        self.addCleanup(setattr, client, "PPM_BACKOFF_FACTOR", backoff)
+
+    def stream(self, status: int):
+        pypi = PyPi("example", None, None, pm=urllib3.PoolManager())
+        pypi._stream(f"{self.base}/{status}", io.BytesIO())
+
+    def streamAsync(self, status: int):
+        async def run():
+            pypi = AsyncPyPi("example", None, None, client=AsyncHttpClient())
+            await pypi._stream(f"{self.base}/{status}", io.BytesIO())
+
+        asyncio.run(run())
+
+    def testMissingFile(self):
+        for status in client.MISSING_STATUSES:
+            with self.subTest(status=status):
+                self.assertRaises(NameError, self.stream, status)
+                self.assertRaises(NameError, self.streamAsync, status)
+
+    def testIndexOutage(self):
+        for status in client.RETRY_STATUSES:
+            with self.subTest(status=status):
+                self.assertRaises(ConnectionError, self.stream, status)
+                self.assertRaises(ConnectionError, self.streamAsync, status)
+
+
+if __name__ == "__main__":
+    unittest.main()
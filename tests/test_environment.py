@@ -0,0 +1,45 @@
+"""
+This is a part of Python Package Manager
+
+Dependency markers are evaluated against the cached environment of the
+interpreter, without probing the platform again
+
+(c) tankalxat34
+"""
+
+import unittest
+from unittest import mock
+
+from utils.package_parser import environment
+from utils.package_parser.packaging import markers
+from utils.package_parser.packaging.markers import Marker
+
+
+class EvaluateMarkerTest(unittest.TestCase):
+    def setUp(self):
+        # The first call may probe the interpreter to fill the cache
+        environment.getMarkerEnvironment()
+
+    def testCachedEnvironment(self):
+        with mock.patch.object(
+            markers, "default_environment", side_effect=AssertionError
+        ) as probe:
+            self.assertTrue(environment.evaluateMarker(Marker("python_version >= '3'")))
+            self.assertFalse(environment.evaluateMarker(Marker("python_version < '3'")))
+        probe.assert_not_called()
+
+    def testExtra(self):
+        marker = Marker("extra == 'socks'")
+        self.assertTrue(environment.evaluateMarker(marker, "socks"))
+        self.assertFalse(environment.evaluateMarker(marker, "zstd"))
+        self.assertFalse(environment.evaluateMarker(marker))
+
+    def testSameAsMarkerEvaluate(self):
+        marker = Marker(
+            "sys_platform == 'win32' or platform_python_implementation == 'CPython'"
+        )
+        self.assertEqual(environment.evaluateMarker(marker), marker.evaluate())
+
+
+if __name__ == "__main__":
+    unittest.main()
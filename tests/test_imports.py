@@ -0,0 +1,41 @@
+"""
+This is a part of Python Package Manager
+
+Every entry point has to be importable on its own, without `utils.config`
+imported first by an application that embeds ppm
+
+(c) tankalxat34
+"""
+
+import pathlib
+import subprocess
+import sys
+import unittest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+MODULES = (
+    "utils.installer.aio",
+    "utils.installer.main",
+    "utils.lockfile.main",
+    "utils.pypi_api.aio",
+    "utils.pypi_api.main",
+    "utils.resolver.aio",
+    "utils.resolver.main",
+)
+
+
+class ImportTest(unittest.TestCase):
+    def testStandaloneImports(self):
+        for module in MODULES:
+            with self.subTest(module=module):
+                process = subprocess.run(
+                    [sys.executable, "-c", f"import {module}"],
+                    cwd=ROOT,
+                    capture_output=True,
+                    text=True,
+                )
+                self.assertEqual(process.returncode, 0, process.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,6 +7,11 @@ https://dev.to/paulasantamaria/command-line-interfaces-structure-syntax-2533
 """
 
 import re
+import threading
+
+# Messages come from worker threads of downloads and installs, a line is
+# written whole under the lock so lines never interleave
+STDOUT_LOCK = threading.Lock()
 
 
 class Prefix(object):
@@ -51,7 +56,10 @@ class Cli:
         intendSize: int = 2,
         prefix: str = "",
     ) -> None:
-        print(" " * intendSize * level, f"[{prefix}] " if prefix else "", *args, sep="")
+        indent = " " * intendSize * level
+        line = "".join([indent, f"[{prefix}] " if prefix else "", *map(str, args)])
+        with STDOUT_LOCK:
+            print(line, flush=True)
 
     @staticmethod
     def stdin(
@@ -1,5 +1,5 @@
-from io import BytesIO
-import sys
+import io
+from typing import BinaryIO
 
 
 BYTES = 1
@@ -8,9 +8,14 @@ MB = 1024 * 1024
 GB = 1024 * 1024 * 1024
 
 
-def calculate_bytes_size(iobytes: BytesIO):
+def calculate_bytes_size(iobytes: BinaryIO | int):
     """Return `tuple` with rounded float number at first and humanized string at second"""
-    size = sys.getsizeof(iobytes)
+    if isinstance(iobytes, int):
+        size = iobytes
+    else:
+        position = iobytes.tell()
+        size = iobytes.seek(0, io.SEEK_END)
+        iobytes.seek(position)
     if size / BYTES <= BYTES:
         return (round(size / BYTES, 1), " BYTES")
     if size / KB <= KB:
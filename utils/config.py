@@ -21,12 +21,17 @@ import os
 import sys
 import pathlib
 import shutil
+from importlib.util import cache_from_source
 from site import getusersitepackages
 from getpass import getuser
 from utils.constants import (
+    PPM_BOOTSTRAP_PACKAGES,
+    PPM_CACHE_PATH,
     PPM_CONFIG_JSON,
     PPM_CREATE_VENV_CMD,
     PPM_GLOBAL_PATH,
+    PPM_MAX_WORKERS,
+    PPM_METADATA_TTL,
     PPM_NAME,
     PPM_PROJECT_PATH,
     PPM_VENV_PATH,
@@ -36,11 +41,28 @@ from utils.constants import (
 )
 
 from utils.ppm_config_parser.main import REQUIRES_DIST, PpmConfig
-from utils.pypi_api.main import PyPi
+from utils.pypi_api import urllib3
+from utils.pypi_api.client import POOL_STATS, configurePool, getPoolManager
+from utils.pypi_api.http2 import getHttp2PoolManager, isAvailable
+from utils.pypi_api.main import (
+    HTTP_CACHE,
+    INSTALLER,
+    METADATA_STORE,
+    WHEEL_CACHE,
+    PyPi,
+)
+from utils.pypi_api.metadata_store import MetadataStore
+from utils.pypi_api.cache import HttpCache
+from utils.pypi_api.wheel_cache import WheelCache
 from utils.cli.main import Cli, Options, Prefix
-from utils.cli.tui import calculate_bytes_size
 from utils.package_parser.main import PackageParser
+from utils.package_parser.site_index import getSiteIndex
 from utils.package_parser.packaging.requirements import Requirement
+from utils.package_parser.packaging.utils import canonicalize_name
+from utils.package_parser.packaging.version import Version
+from utils.resolver.main import METADATA_ERRORS, Candidate, Resolver
+from utils.installer.main import Pipeline
+from utils.lockfile.main import PpmLock
 from utils.decorators.handlers import handle_AskBeforeStart, handle_KeyboardInterrupt
 
 
@@ -62,15 +84,136 @@ def print_dict_with_indent(d, indent=0):
 
 def getInstalledPackages(cli: Cli) -> list[str]:
     PPM_PATH = getSitePath(cli)
-
-    listdir = os.listdir(PPM_PATH)
-    out_filter = list(
-        map(
-            lambda x: x.split("-")[0],
-            filter(lambda x: ".dist-info" in x, listdir),
+    return [distribution.name for distribution in getSiteIndex(PPM_PATH)]
+
+
+def getHttpCache(cli: Cli) -> HttpCache | None:
+    """Returns cache of index responses configured by options `--no-cache`
+    and `--cache-ttl=SECONDS`"""
+    if "no-cache" in cli.options:
+        return None
+    if "cache-ttl" in cli.options:
+        return HttpCache(ttl=float(cli.options["cache-ttl"]))
+    return HTTP_CACHE
+
+
+def getWheelCache(cli: Cli) -> WheelCache | None:
+    """Returns cache of downloaded wheels configured by options `--no-cache`
+    and `--cache-size=MEGABYTES`"""
+    if "no-cache" in cli.options:
+        return None
+    if "cache-size" in cli.options:
+        return WheelCache(maxSize=int(float(cli.options["cache-size"]) * 1024 * 1024))
+    return WHEEL_CACHE
+
+
+def getMetadataStore(cli: Cli) -> MetadataStore | None:
+    """Returns store of index metadata shared by commands of the session.
+    Option `--cache-ttl=SECONDS` sets the age of entries the command may
+    reuse, with `--no-cache` every command asks the index again"""
+    if "no-cache" in cli.options:
+        return None
+    METADATA_STORE.ttl = float(cli.options.get("cache-ttl", PPM_METADATA_TTL))
+    return METADATA_STORE
+
+
+def getConnectionPool(cli: Cli) -> urllib3.PoolManager:
+    """Returns connection pool shared by the process configured by options
+    `--pool-size=N` and `--no-pool-block`. With `--http2` index requests are
+    multiplexed over HTTP/2 when the package `h2` is installed"""
+    if "pool-size" in cli.options or "no-pool-block" in cli.options:
+        configurePool(
+            int(cli.options.get("pool-size", PPM_MAX_WORKERS)),
+            block="no-pool-block" not in cli.options,
         )
+    if "http2" in cli.options:
+        if not isAvailable():
+            Cli.stdout(
+                "Package 'h2' is not installed, HTTP/1.1 is used",
+                prefix=Prefix.WARGING,
+            )
+            return getPoolManager()
+        return getHttp2PoolManager(getPoolManager())
+    return getPoolManager()
+
+
+def _installPlan(
+    cli: Cli, plan: list[Candidate], pm: urllib3.PoolManager
+) -> list[Candidate]:
+    """Download and unpack every candidate of `plan`. Returns installed ones"""
+    PPM_PATH = getSitePath(cli)
+    pipeline = Pipeline(
+        PPM_PATH, pm, compile="no-compile" not in tuple(cli.options.keys())
+    )
+    jobs = pipeline.run(plan)
+    if pipeline.fatalError is not None:
+        raise pipeline.fatalError
+    if plan:
+        Cli.stdout(pipeline.summary(), prefix=Prefix.INFO)
+        for line in pipeline.timings().splitlines():
+            Cli.stdout(line, level=1)
+        Cli.stdout(f"Connections: {POOL_STATS.summary()}", level=1)
+        Cli.stdout(f"Metadata: {METADATA_STORE.summary()}", level=1)
+
+    installed: list[Candidate] = []
+    for job in jobs:
+        package, version = job.candidate.name, job.candidate.version
+
+        Cli.stdout(f"Installing {package}=={version}", level=1)
+
+        if job.error is not None:
+            # Only a broken release is skipped, a dependency missing because
+            # the index was unreachable would leave a partial environment
+            if not job.candidate.depth or not isinstance(job.error, METADATA_ERRORS):
+                raise job.error
+            Cli.stdout(
+                f"Dependency '{package}' has been skipped: {job.error}",
+                prefix=Prefix.WARGING,
+                level=1,
+            )
+            continue
+
+        Cli.stdout(f"Package size is {job.size[0]}{job.size[1]}", level=1)
+        Cli.stdout(f"Successfully unpacked to '{PPM_PATH}'", level=1)
+        installed.append(job.candidate)
+    return installed
+
+
+def _installLocked(cli: Cli, requires: list[str], _installedPackages: list[str]):
+    """Install packages pinned in up-to-date `ppm.lock` without resolving"""
+    PPM_PATH = getSitePath(cli)
+    LOCK = PpmLock()
+    pm = getConnectionPool(cli)
+    Cli.stdout(f"Using lock file '{LOCK.path}'", prefix=Prefix.INFO)
+
+    site = getSiteIndex(PPM_PATH)
+    plan: list[Candidate] = []
+    for candidate in LOCK.candidates(
+        requires, cache=getHttpCache(cli), wheelCache=getWheelCache(cli), pm=pm
+    ):
+        installed = site.get(candidate.name)
+        if installed is None:
+            plan.append(candidate)
+            continue
+        if Version(installed.version) != Version(candidate.version):
+            Cli.stdout(
+                f"Package '{candidate.name}' is installed in version "
+                f"{installed.version}, but locked in version {candidate.version}",
+                prefix=Prefix.WARGING,
+            )
+        else:
+            Cli.stdout(
+                f"Package '{candidate.name}' has been skipped because it's installed before",
+                prefix=Prefix.INFO,
+            )
+
+    for candidate in _installPlan(cli, plan, pm):
+        _installedPackages.append(f"{candidate.name}-{candidate.version}")
+    return (
+        f"Complete installing packages: {' '.join(set(_installedPackages))}"
+        if len(_installedPackages)
+        else ""
     )
-    return out_filter
 
 
 def install(cli: Cli, _installedPackages: list[str] = []):
@@ -80,6 +223,11 @@ def install(cli: Cli, _installedPackages: list[str] = []):
 
     if not len(packages):
         config_content = CONFIG.read()
+        if PpmLock().isUpToDate(config_content.get(REQUIRES_DIST, [])):
+            return _installLocked(
+                cli, config_content[REQUIRES_DIST], _installedPackages
+            )
+
         joinedAliases = "-" + " -".join(cli.aliases)
         requires_dist_cmd = (
             f"ppm install {joinedAliases} {' '.join(config_content[REQUIRES_DIST])}"
@@ -89,76 +237,26 @@ def install(cli: Cli, _installedPackages: list[str] = []):
             _installedPackages,
         )
 
-    for position, pack in enumerate(packages):
-        requirement = Requirement(pack.replace(";", ""))
-        package = requirement.name
-
-        try:
-            if PackageParser(
-                PPM_PATH, convertPackageName(package.lower())
-            ).isInstalled():
-                Cli.stdout(
-                    f"Package '{package}' has been skipped because it's installed before",
-                    prefix=Prefix.INFO,
-                )
-                continue
-        except Exception:
-            pass
-
-        Cli.stdout(f"Collecting '{requirement}'")
-        pypi = PyPi(package)
-        pypi.fetch()
-        releases = pypi.releases()
-
-        version: str = pypi.json["info"]["version"]
-        if not requirement.specifier.contains(version):
-            for release in releases[::-1]:
-                if requirement.specifier.contains(release):
-                    version = release
-                    break
-
-        Cli.stdout(f"Installing {package}=={version}", level=1)
-
-        archive = pypi.fetchArchive(version)
-        archiveSize = calculate_bytes_size(archive)
-        Cli.stdout(f"Package size is {(archiveSize)[0]}{archiveSize[1]}", level=1)
-
-        pypi.upackArchive(archive, PPM_PATH)
+    requirements = [Requirement(pack.replace(";", "")) for pack in packages]
+    resolver = Resolver(
+        PPM_PATH,
+        withDeps="no-deps" not in tuple(cli.options.keys()),
+        cache=getHttpCache(cli),
+        wheelCache=getWheelCache(cli),
+        pm=getConnectionPool(cli),
+        store=getMetadataStore(cli),
+    )
+    plan = resolver.resolve(requirements)
 
-        Cli.stdout(f"Successfully unpacked to '{PPM_PATH}'", level=1)
+    for candidate in _installPlan(cli, plan, resolver.pm):
+        package, version = candidate.name, candidate.version
         _installedPackages.append(package + "-" + str(version))
 
-        if "no-strict-req" in cli.options:
-            CONFIG.addRequirement(requirement)
+        if "no-strict-req" in cli.options and not candidate.depth:
+            CONFIG.addRequirement(candidate.requirement)
         else:
             CONFIG.addRequirement(Requirement(f"{package}=={str(version)}"))
 
-        if pypi.json["info"]["requires_dist"] and (
-            "no-deps" not in tuple(cli.options.keys())
-        ):
-            for req_dist in pypi.json["info"]["requires_dist"]:
-                child_requirement = Requirement(req_dist)
-
-                if (not bool(child_requirement.marker)) or (
-                    child_requirement.marker
-                    and child_requirement.marker.evaluate(
-                        {"extra": list(requirement.extras)[0]}
-                        if requirement.extras
-                        else None
-                    )
-                ):
-                    try:
-                        joinedAliases = "-" + " -".join(cli.aliases)
-                        requires_dist_cmd = (
-                            f"ppm install {joinedAliases} {req_dist.replace(' ', '')}"
-                        )
-                        install(
-                            Cli(requires_dist_cmd),
-                            _installedPackages,
-                        )
-                    except Exception:
-                        pass
-
     return (
         f"Complete installing packages: {' '.join(set(_installedPackages))}"
         if len(_installedPackages)
@@ -166,6 +264,128 @@ def install(cli: Cli, _installedPackages: list[str] = []):
     )
 
 
+def sync(cli: Cli):
+    """Make the site match the lock file. Only packages installed by ppm or
+    locked before are removed, the rest of the site belongs to the venv
+    bootstrap, to pip or to other projects. Removal from the global site is
+    confirmed first"""
+    PPM_PATH = getSitePath(cli)
+    CONFIG = PpmConfig()
+    LOCK = PpmLock()
+    requires = CONFIG.read().get(REQUIRES_DIST, [])
+    managed = LOCK.names()
+
+    if not LOCK.isUpToDate(requires):
+        Cli.stdout(f"Lock file '{LOCK.path}' is outdated", prefix=Prefix.INFO)
+        Cli.stdout(lock(cli), prefix=Prefix.INFO)
+
+    pm = getConnectionPool(cli)
+    locked = {
+        canonicalize_name(candidate.name): candidate
+        for candidate in LOCK.candidates(
+            requires, cache=getHttpCache(cli), wheelCache=getWheelCache(cli), pm=pm
+        )
+    }
+    site = getSiteIndex(PPM_PATH)
+
+    add = [c for name, c in locked.items() if name not in site]
+    replace = [
+        c
+        for name, c in locked.items()
+        if name in site and Version(site.get(name).version) != Version(c.version)
+    ]
+    remove = [
+        dist
+        for dist in site
+        if (name := canonicalize_name(dist.name)) not in locked
+        and name not in PPM_BOOTSTRAP_PACKAGES
+        and (
+            name in managed
+            or PackageParser(PPM_PATH, dist.name.lower()).getInstaller() == INSTALLER
+        )
+    ]
+    if remove and "g" in cli.aliases:
+        for dist in remove:
+            Cli.stdout(f"{dist.name}=={dist.version}", level=1)
+        yesStatus = "y" in cli.aliases or "yes" in cli.options
+        userInputRemove = "y" if yesStatus else Cli.stdin(
+            f"Remove these packages from the global site '{PPM_PATH}'?",
+            Options.NOYES,
+            errorIfUnknownOption=True,
+        )
+        if userInputRemove != "y":
+            Cli.stdout("Packages are kept in the global site", prefix=Prefix.INFO)
+            remove = []
+    if not add and not replace and not remove:
+        return f"Environment '{PPM_PATH}' is up to date with the lock file"
+
+    for candidate in replace:
+        dist = site.get(candidate.name)
+        Cli.stdout(f"Replacing {dist.name}=={dist.version} by {candidate.version}")
+        _removeDistribution(PPM_PATH, PackageParser(PPM_PATH, dist.name.lower()))
+    for dist in remove:
+        Cli.stdout(f"Removing {dist.name}=={dist.version}")
+        _removeDistribution(PPM_PATH, PackageParser(PPM_PATH, dist.name.lower()))
+    for candidate in add:
+        Cli.stdout(f"Adding {candidate.name}=={candidate.version}")
+
+    installed = _installPlan(cli, add + replace, pm)
+    return (
+        f"Synchronized '{PPM_PATH}': {len(add)} added, {len(replace)} replaced, "
+        f"{len(remove)} removed, {len(add) + len(replace) - len(installed)} failed"
+    )
+
+
+def lock(cli: Cli):
+    CONFIG = PpmConfig()
+    LOCK = PpmLock()
+    requires = CONFIG.read().get(REQUIRES_DIST, [])
+
+    # Lock describes the whole graph, so installed packages are resolved too
+    resolver = Resolver(
+        getSitePath(cli),
+        cache=getHttpCache(cli),
+        wheelCache=getWheelCache(cli),
+        pm=getConnectionPool(cli),
+        pinInstalled=False,
+        store=getMetadataStore(cli),
+    )
+    plan = resolver.resolve([Requirement(req) for req in requires])
+    content = LOCK.write(requires, plan)
+
+    for package in content["packages"]:
+        Cli.stdout(f"{package['name']}=={package['version']}", level=1)
+    return f"Locked {len(content['packages'])} packages to '{LOCK.path}'"
+
+
+def _removeDistribution(sitePath: str | pathlib.Path, packageParser: PackageParser):
+    """Delete files of installed distribution listed in its `RECORD` and dirs
+    that are left empty"""
+    site = pathlib.Path(sitePath).absolute()
+    distinfo = packageParser.getDistInfo()
+    dirs: set[pathlib.Path] = set()
+
+    for file in packageParser.getRecord():
+        path = pathlib.Path(os.path.normpath(pathlib.Path(site, file["path"])))
+        path.unlink(missing_ok=True)
+        if path.suffix == ".py":
+            # Byte-code written by the compile stage is not listed in RECORD
+            pathlib.Path(cache_from_source(str(path))).unlink(missing_ok=True)
+        dirs.update(parent for parent in path.parents if site in parent.parents)
+
+    shutil.rmtree(pathlib.Path(site, distinfo), ignore_errors=True)
+    for directory in sorted(dirs, key=lambda d: len(d.parts), reverse=True):
+        shutil.rmtree(pathlib.Path(directory, "__pycache__"), ignore_errors=True)
+        try:
+            directory.rmdir()
+        except OSError:
+            pass
+    try:
+        pathlib.Path(site, "__pycache__").rmdir()
+    except OSError:
+        pass
+
+
 def uninstall(cli: Cli):
     PPM_PATH = getSitePath(cli)
     CONFIG = PpmConfig()
@@ -180,18 +400,8 @@ def uninstall(cli: Cli):
 
         CONFIG.uninstallRequirement(Requirement(package))
 
-        distinfo = packageParser.getDistInfo()
-        record = packageParser.getRecord()
         metadata = packageParser.getMetadata()
-
-        for file in record:
-            pathlib.Path(PPM_PATH, file["path"]).absolute().unlink()
-
-        shutil.rmtree(pathlib.Path(PPM_PATH, distinfo).absolute())
-        try:
-            shutil.rmtree(pathlib.Path(PPM_PATH, package).absolute())
-        except Exception:
-            pass
+        _removeDistribution(PPM_PATH, packageParser)
 
         Cli.stdout(
             f"Package {ui_packages[i]}=={''.join(metadata['Version'])} successfully deleted",
@@ -214,10 +424,7 @@ def view(cli: Cli):
     if len(cli.arguments) >= 2:
         package = convertPackageName(cli.arguments[1])
         packageParser = PackageParser(PPM_PATH, package)
-
-        distinfo = packageParser.getDistInfo()
-        record = packageParser.getRecord()
-        metadata = packageParser.getMetadata()
+        metadata = packageParser.getCachedMetadata()
 
         result: str = ""
 
@@ -254,8 +461,13 @@ def upgrade(cli: Cli):
 
 
 def releases(cli: Cli):
-    pypi = PyPi(cli.arguments[1])
-    pypi.fetch()
+    pypi = PyPi(
+        cli.arguments[1],
+        cache=getHttpCache(cli),
+        pm=getConnectionPool(cli),
+        store=getMetadataStore(cli),
+    )
+    pypi.fetchSimple(allowYanked=True)
     releases = pypi.releases()
 
     return "\n".join(releases)
@@ -338,6 +550,8 @@ CLI_CONFIG = {
     "ppm": {
         # arguments
         "install": lambda cli: install(cli, []),
+        "lock": lambda cli: lock(cli),
+        "sync": lambda cli: sync(cli),
         "uninstall": lambda cli: uninstall(cli),
         "upgrade": lambda cli: upgrade(cli),
         "view": lambda cli: view(cli),
@@ -350,6 +564,11 @@ CLI_CONFIG = {
 Version: {PPM_VERSION}
 Global site-path: {PPM_GLOBAL_PATH}
 Project site-path: {PPM_PROJECT_PATH}
+Cache path: {PPM_CACHE_PATH}
+Connection pool: {getConnectionPool(cli).connection_pool_kw["maxsize"]} per host
+HTTP/2: {"available with --http2" if isAvailable() else "package 'h2' is not installed"}
+Connections: {POOL_STATS.summary()}
+Metadata: {METADATA_STORE.summary()}
 """,
     },
     "exit": lambda cli: quit(),
@@ -15,6 +15,7 @@ PPM_CLI_TITLE = f"""{PPM_NAME} ({PPM_VERSION}) - {USER_PLATFORM} Python {USER_VE
 PPM_DEFAULT_VENV_DIR_NAME = "venv"
 PPM_CREATE_VENV_CMD = f"python -m venv {PPM_DEFAULT_VENV_DIR_NAME}"
 PPM_CONFIG_JSON = "ppm.config.json"
+PPM_LOCK = "ppm.lock"
 PPM_REQUIREMENTS_TXT = "requirements.txt"
 PPM_VENV_PATH = pathlib.Path(
     os.getcwd(), PPM_DEFAULT_VENV_DIR_NAME, "lib", "site-packages"
@@ -25,6 +26,21 @@ PPM_PROJECT_PATH = (
     else PPM_VENV_PATH
 )
 PPM_GLOBAL_PATH = getusersitepackages()
+PPM_CACHE_PATH = pathlib.Path(pathlib.Path.home(), ".cache", "ppm").absolute()
+PPM_METADATA_TTL = 600
+# Packages of the venv bootstrap, `ppm sync` never removes them
+PPM_BOOTSTRAP_PACKAGES = frozenset(["pip", "setuptools", "wheel"])
+PPM_WHEEL_CACHE_SIZE = 1024 * 1024 * 1024
+PPM_DOWNLOAD_CHUNK = 64 * 1024
+PPM_MAX_WORKERS = 8
+PPM_POOL_BLOCK = True
+PPM_EXTRACT_BACKLOG = 2 * PPM_MAX_WORKERS
+PPM_RETRIES = 5
+PPM_BACKOFF_FACTOR = 0.25
+PPM_BACKOFF_MAX = 30
+PPM_RETRY_AFTER_MAX = 60
+PPM_CONNECT_TIMEOUT = 10
+PPM_READ_TIMEOUT = 30
 
 
 def getSitePath(cli: Cli) -> str | pathlib.Path:
@@ -0,0 +1,254 @@
+"""
+This is a part of Python Package Manager
+
+Install engine for asyncio applications. Packages of the plan are
+downloaded by tasks of the caller's event loop and handed to extraction
+through a bounded backlog: a dependency is downloaded only when fewer
+than `backlog` archives are downloading or waiting to be extracted, so a
+slow disk holds downloads back instead of piling up archives. Extraction
+and byte-compilation give control back to the loop after every file.
+Cancelling an install cancels downloads in flight, closes their
+connections and removes partial files
+
+(c) tankalxat34
+"""
+
+import asyncio
+import compileall
+import pathlib
+import time
+import zipfile
+from typing import Iterator
+
+from utils.cli.main import Cli, Prefix
+from utils.cli.tui import calculate_bytes_size
+from utils.constants import PPM_EXTRACT_BACKLOG, PPM_PROJECT_PATH
+from utils.package_parser.packaging.requirements import Requirement
+from utils.pypi_api.async_client import AsyncHttpClient, getAsyncClient
+from utils.pypi_api.cache import HttpCache
+from utils.pypi_api.main import HTTP_CACHE, METADATA_STORE, WHEEL_CACHE, markInstaller
+from utils.pypi_api.metadata_store import MetadataStore
+from utils.pypi_api.wheel_cache import WheelCache
+from utils.resolver.aio import AsyncResolver
+from utils.resolver.main import METADATA_ERRORS, Candidate
+from .main import Job, verifyWheel
+
+_STOP = None
+
+
+class AsyncPipeline:
+    def __init__(
+        self,
+        sitePath: str | pathlib.Path,
+        client: AsyncHttpClient | None = None,
+        compile: bool = True,
+        backlog: int = PPM_EXTRACT_BACKLOG,
+    ) -> None:
+        self.path = sitePath
+        self.client = client or getAsyncClient()
+        self.compile = compile
+        self.backlog = backlog
+        self.workers = self.client.maxsize
+
+        self.bytesDownloaded = 0
+        self.elapsed = 0.0
+        self.cached = 0
+
+        self._rootsPending = 0
+        self._rootsVerified = asyncio.Event()
+        self._aborted = False
+        self.fatalError: Exception | None = None
+
+    async def _download(self, job: Job):
+        candidate = job.candidate
+        candidate.pypi.client = self.client
+        job.archive = await candidate.pypi.fetchArchive(candidate.version)
+        job.size = calculate_bytes_size(job.archive)
+
+    async def _extract(self, job: Job):
+        job.archive.seek(0)
+        with zipfile.ZipFile(job.archive, "r") as archive:
+            job.files = archive.namelist()
+            for name in job.files:
+                archive.extract(name, self.path)
+                await asyncio.sleep(0)
+        job.files = markInstaller(self.path, job.files)
+        job.archive.close()
+
+    async def _compile(self, job: Job):
+        for name in job.files:
+            if name.endswith(".py"):
+                compileall.compile_file(
+                    str(pathlib.Path(self.path, name)), quiet=2, force=True
+                )
+                await asyncio.sleep(0)
+
+    def _verified(self, job: Job):
+        fatal = job.error is not None and (
+            not job.candidate.depth or not isinstance(job.error, METADATA_ERRORS)
+        )
+        if job.candidate.depth and not fatal:
+            return
+        if fatal:
+            self._aborted = True
+            self.fatalError = self.fatalError or job.error
+        if not job.candidate.depth:
+            self._rootsPending -= 1
+        if self._aborted or self._rootsPending <= 0:
+            self._rootsVerified.set()
+
+    async def _downloader(
+        self, jobs: Iterator[Job], ready: asyncio.Queue, slots: asyncio.Semaphore
+    ):
+        for job in jobs:
+            # Top-level packages take no slot: extraction waits for all of them
+            dependency = bool(job.candidate.depth)
+            if dependency:
+                await slots.acquire()
+            stage = "download"
+            try:
+                if self._aborted:
+                    raise RuntimeError("Installation has been aborted")
+                await self._download(job)
+                stage = "verify"
+                verifyWheel(job)
+            except Exception as error:
+                job.error = error
+                job.failedStage = stage
+            self._verified(job)
+            if job.error is None:
+                ready.put_nowait(job)
+                continue
+            if job.archive:
+                job.archive.close()
+            if dependency:
+                slots.release()
+
+    async def _extractor(self, ready: asyncio.Queue, slots: asyncio.Semaphore):
+        while (job := await ready.get()) is not _STOP:
+            stage = "extract"
+            try:
+                # Nothing is written to the site-packages dir before
+                # top-level packages are downloaded and verified
+                await self._rootsVerified.wait()
+                if self._aborted:
+                    raise RuntimeError("Installation has been aborted")
+                await self._extract(job)
+                if self.compile:
+                    stage = "compile"
+                    await self._compile(job)
+            except Exception as error:
+                job.error = error
+                job.failedStage = stage
+            finally:
+                job.archive.close()
+                if job.candidate.depth:
+                    slots.release()
+
+    async def run(self, plan: list[Candidate]) -> list[Job]:
+        """Install every candidate of `plan`. Returns jobs in the order of
+        `plan`, failed jobs keep the error. When a top-level package fails
+        before extraction nothing is installed and the error is kept in
+        `fatalError`. So is a network error of a dependency, after which
+        no more packages are extracted"""
+        started = time.perf_counter()
+        jobs = [Job(candidate) for candidate in plan]
+
+        self._rootsPending = sum(1 for job in jobs if not job.candidate.depth)
+        if not self._rootsPending:
+            self._rootsVerified.set()
+
+        # Top-level packages are downloaded first, so they never wait for
+        # the backlog that is freed only after they are verified
+        order = iter(sorted(jobs, key=lambda job: job.candidate.depth))
+        ready: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(self.backlog)
+        downloaders = [
+            asyncio.ensure_future(self._downloader(order, ready, slots))
+            for _ in range(max(1, min(self.workers, len(jobs))))
+        ]
+        extractor = asyncio.ensure_future(self._extractor(ready, slots))
+        try:
+            await asyncio.gather(*downloaders)
+            ready.put_nowait(_STOP)
+            await extractor
+        finally:
+            for task in (*downloaders, extractor):
+                task.cancel()
+            await asyncio.gather(*downloaders, extractor, return_exceptions=True)
+            for job in jobs:
+                if job.archive:
+                    job.archive.close()
+
+        self.elapsed = time.perf_counter() - started
+        self.bytesDownloaded = sum(c.pypi.bytesDownloaded for c in plan)
+        self.cached = sum(
+            1
+            for job in jobs
+            if job.error is None and not job.candidate.pypi.bytesDownloaded
+        )
+        return jobs
+
+    def summary(self) -> str:
+        """Return aggregate download throughput of the last `run`"""
+        size = calculate_bytes_size(self.bytesDownloaded)
+        speed = calculate_bytes_size(
+            int(self.bytesDownloaded / max(self.elapsed, 1e-3))
+        )
+        return (
+            f"Downloaded {size[0]}{size[1]} in {self.elapsed:.2f}s "
+            f"({speed[0]}{speed[1]}/s, {self.workers} connections per host), "
+            f"{self.cached} taken from cache"
+        )
+
+
+async def install(
+    requirements: list[str | Requirement],
+    sitePath: str | pathlib.Path = PPM_PROJECT_PATH,
+    withDeps: bool = True,
+    cache: HttpCache | None = HTTP_CACHE,
+    wheelCache: WheelCache | None = WHEEL_CACHE,
+    client: AsyncHttpClient | None = None,
+    compile: bool = True,
+    backlog: int = PPM_EXTRACT_BACKLOG,
+    store: MetadataStore | None = METADATA_STORE,
+) -> list[Candidate]:
+    """Resolve `requirements` and install them to `sitePath` in the running
+    event loop. Returns installed candidates.
+
+    Errors of the top-level requirements and network errors are raised,
+    broken dependencies are reported and skipped. Packages installed
+    before are kept"""
+    client = client or getAsyncClient()
+    resolver = AsyncResolver(
+        sitePath,
+        withDeps=withDeps,
+        cache=cache,
+        wheelCache=wheelCache,
+        client=client,
+        store=store,
+    )
+    plan = await resolver.resolve(
+        [Requirement(req) if isinstance(req, str) else req for req in requirements]
+    )
+
+    pipeline = AsyncPipeline(sitePath, client, compile=compile, backlog=backlog)
+    jobs = await pipeline.run(plan)
+    if pipeline.fatalError is not None:
+        raise pipeline.fatalError
+    if plan:
+        Cli.stdout(pipeline.summary(), prefix=Prefix.INFO)
+
+    installed: list[Candidate] = []
+    for job in jobs:
+        if job.error is None:
+            installed.append(job.candidate)
+            continue
+        if not job.candidate.depth or not isinstance(job.error, METADATA_ERRORS):
+            raise job.error
+        Cli.stdout(
+            f"Dependency '{job.candidate.name}' has been skipped: {job.error}",
+            prefix=Prefix.WARGING,
+            level=1,
+        )
+    return installed
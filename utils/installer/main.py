@@ -0,0 +1,257 @@
+"""
+This is a part of Python Package Manager
+
+Install engine of `ppm install`. When the install plan is known, packages
+flow through the pipeline of stages
+
+    download -> verify -> extract -> compile
+
+Stages run concurrently and are connected by queues, so while one package
+is extracted the next ones are downloaded and the previous one is
+byte-compiled. Download stage has one worker per connection that the pool
+keeps for a host. Busy time of every stage is measured to show which one
+is the bottleneck on the given machine
+
+(c) tankalxat34
+"""
+
+import compileall
+import pathlib
+import queue
+import threading
+import time
+import zipfile
+from typing import BinaryIO, Callable
+
+from utils.cli.tui import calculate_bytes_size
+from utils.package_parser.packaging.utils import canonicalize_name
+from utils.pypi_api import urllib3
+from utils.pypi_api.client import getPoolManager
+from utils.resolver.main import METADATA_ERRORS, Candidate
+
+_STOP = None
+
+
+class Job:
+    """State of a single package passing through the pipeline"""
+
+    def __init__(self, candidate: Candidate) -> None:
+        self.candidate = candidate
+        self.archive: BinaryIO | None = None
+        self.size: tuple[float, str] = (0, " BYTES")
+        self.files: list[str] = []
+        self.error: Exception | None = None
+        self.failedStage = ""
+
+
+def verifyWheel(job: Job):
+    """Check that archive is a wheel of the expected package"""
+    with zipfile.ZipFile(job.archive, "r") as archive:
+        distInfo = {
+            name.split("/")[0]
+            for name in archive.namelist()
+            if name.split("/")[0].endswith(".dist-info")
+        }
+    name = canonicalize_name(job.candidate.name)
+    if not any(
+        canonicalize_name(d[: -len(".dist-info")].rsplit("-", 1)[0]) == name
+        for d in distInfo
+    ):
+        raise ValueError(f"Archive of '{job.candidate.name}' is not a valid wheel")
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[[Job], None], workers: int = 1) -> None:
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+        self.busy = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def process(self, job: Job):
+        started = time.perf_counter()
+        try:
+            self.func(job)
+        except Exception as error:
+            job.error = error
+            job.failedStage = self.name
+        finally:
+            with self._lock:
+                self.busy += time.perf_counter() - started
+                self.count += 1
+
+    @property
+    def load(self) -> float:
+        """Busy time per worker"""
+        return self.busy / self.workers
+
+
+class Pipeline:
+    def __init__(
+        self,
+        sitePath: str | pathlib.Path,
+        pm: urllib3.PoolManager | None = None,
+        compile: bool = True,
+    ) -> None:
+        self.path = sitePath
+        self.pm = pm or getPoolManager()
+        self.workers: int = self.pm.connection_pool_kw.get("maxsize", 1)
+
+        self.stages = [
+            Stage("download", self._download, self.workers),
+            Stage("verify", self._verify),
+            Stage("extract", self._extract),
+        ]
+        if compile:
+            self.stages.append(Stage("compile", self._compile))
+
+        self.bytesDownloaded = 0
+        self.elapsed = 0.0
+        self.cached = 0
+
+        self._rootsPending = 0
+        self._rootsLock = threading.Lock()
+        self._rootsVerified = threading.Event()
+        self._aborted = False
+        self.fatalError: Exception | None = None
+
+    def _download(self, job: Job):
+        candidate = job.candidate
+        candidate.pypi.pm = self.pm
+        job.archive = candidate.pypi.fetchArchive(candidate.version)
+        job.size = calculate_bytes_size(job.archive)
+
+    def _verify(self, job: Job):
+        verifyWheel(job)
+
+    def _extract(self, job: Job):
+        # Nothing is written to the site-packages dir before top-level
+        # packages are downloaded and verified
+        self._rootsVerified.wait()
+        if self._aborted:
+            raise RuntimeError("Installation has been aborted")
+        job.archive.seek(0)
+        job.files = job.candidate.pypi.upackArchive(job.archive, self.path)
+        job.archive.close()
+
+    def _compile(self, job: Job):
+        for name in job.files:
+            if name.endswith(".py"):
+                compileall.compile_file(
+                    str(pathlib.Path(self.path, name)), quiet=2, force=True
+                )
+
+    def _verified(self, job: Job):
+        """Count verified top-level package. A failed top-level package or
+        a dependency failed by other than a broken release stops extraction"""
+        fatal = job.error is not None and (
+            not job.candidate.depth or not isinstance(job.error, METADATA_ERRORS)
+        )
+        if job.candidate.depth and not fatal:
+            return
+        with self._rootsLock:
+            if fatal:
+                self._aborted = True
+                self.fatalError = self.fatalError or job.error
+            if not job.candidate.depth:
+                self._rootsPending -= 1
+            if self._aborted or self._rootsPending <= 0:
+                self._rootsVerified.set()
+
+    def _worker(
+        self,
+        index: int,
+        inbox: queue.Queue,
+        outbox: queue.Queue,
+        remaining: list[int],
+        lock: threading.Lock,
+    ):
+        stage = self.stages[index]
+        while True:
+            job: Job | None = inbox.get()
+            if job is _STOP:
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0]:
+                        return
+                outbox.put(_STOP)
+                return
+
+            if job.error is None:
+                stage.process(job)
+            if stage.name == "verify":
+                self._verified(job)
+            if job.error is not None and job.archive:
+                job.archive.close()
+            outbox.put(job)
+
+    def run(self, plan: list[Candidate]) -> list[Job]:
+        """Install every candidate of `plan`. Returns jobs in the order of
+        `plan`, failed jobs keep the error. When a top-level package fails
+        before extraction nothing is installed and the error is kept in
+        `fatalError`. So is a network error of a dependency, after which
+        no more packages are extracted"""
+        started = time.perf_counter()
+        jobs = [Job(candidate) for candidate in plan]
+
+        self._rootsPending = sum(1 for job in jobs if not job.candidate.depth)
+        if not self._rootsPending:
+            self._rootsVerified.set()
+
+        queues = [queue.Queue() for _ in range(len(self.stages) + 1)]
+        threads: list[threading.Thread] = []
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for _ in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(index, queues[index], queues[index + 1], remaining, lock),
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        for job in jobs:
+            queues[0].put(job)
+        for _ in range(self.stages[0].workers):
+            queues[0].put(_STOP)
+
+        while queues[-1].get() is not _STOP:
+            pass
+        for thread in threads:
+            thread.join()
+
+        for job in jobs:
+            if job.archive:
+                job.archive.close()
+
+        self.elapsed = time.perf_counter() - started
+        self.bytesDownloaded = sum(c.pypi.bytesDownloaded for c in plan)
+        self.cached = sum(
+            1
+            for job in jobs
+            if job.error is None and not job.candidate.pypi.bytesDownloaded
+        )
+        return jobs
+
+    def summary(self) -> str:
+        """Return aggregate download throughput of the last `run`"""
+        size = calculate_bytes_size(self.bytesDownloaded)
+        speed = calculate_bytes_size(int(self.bytesDownloaded / max(self.elapsed, 1e-3)))
+        return (
+            f"Downloaded {size[0]}{size[1]} in {self.elapsed:.2f}s "
+            f"({speed[0]}{speed[1]}/s, {self.workers} connections per host), "
+            f"{self.cached} taken from cache"
+        )
+
+    def timings(self) -> str:
+        """Return busy time of every stage of the last `run`"""
+        bottleneck = max(self.stages, key=lambda stage: stage.load)
+        return "\n".join(
+            f"{stage.name}: {stage.busy:.2f}s busy, {stage.count} packages, "
+            f"{stage.workers} workers" + (" <- bottleneck" if stage is bottleneck else "")
+            for stage in self.stages
+        )
@@ -0,0 +1,156 @@
+"""
+This is a part of Python Package Manager
+
+Lockfile `ppm.lock` keeps the resolved dependency graph of the project:
+every package pinned to a version, with the wheel chosen for this platform,
+its URL and sha256. The lock stores the hash of its inputs, requirements
+of `ppm.config.json` and the best wheel tag of the interpreter, so
+`ppm install` trusts an up-to-date lock and goes straight to downloads
+without a single request of metadata
+
+(c) tankalxat34
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+from typing import Any
+
+from utils.package_parser.environment import getSupportedTags
+from utils.package_parser.packaging.requirements import Requirement
+from utils.package_parser.packaging.utils import canonicalize_name
+from utils.pypi_api import urllib3
+from utils.pypi_api.cache import HttpCache
+from utils.pypi_api.main import HTTP_CACHE, WHEEL_CACHE, PyPi
+from utils.pypi_api.simple import DistFile
+from utils.pypi_api.wheel_cache import WheelCache
+from utils.resolver.main import Candidate
+from .. import constants
+
+LOCK_VERSION = 1
+LOCK_PATH = pathlib.Path(os.getcwd(), constants.PPM_LOCK).absolute()
+
+
+def inputsHash(requires: list[str]) -> str:
+    """Returns hash of everything the resolved graph depends on"""
+    tag = min(getSupportedTags().items(), key=lambda item: item[1])[0]
+    content = {
+        "requires": sorted(str(Requirement(req)) for req in requires),
+        "tag": str(tag),
+    }
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class PpmLock:
+    def __init__(self, path: str | pathlib.Path = LOCK_PATH):
+        self.path = pathlib.Path(path)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def read(self) -> dict[str, Any]:
+        with open(self.path, "r", encoding="utf-8") as file:
+            try:
+                return json.load(file)
+            except Exception:
+                raise SyntaxError("Lock file is empty or contains invalid JSON")
+
+    def names(self) -> set[str]:
+        """Returns canonical names of locked packages, empty without a valid
+        lock file"""
+        try:
+            content = self.read()
+        except (OSError, SyntaxError):
+            return set()
+        return {package["name"] for package in content.get("packages", [])}
+
+    def isUpToDate(self, requires: list[str]) -> bool:
+        """Returns `True` if the lock was written for `requires` on this platform"""
+        try:
+            content = self.read()
+        except (OSError, SyntaxError):
+            return False
+        return (
+            content.get("version") == LOCK_VERSION
+            and content.get("inputs") == inputsHash(requires)
+        )
+
+    def write(self, requires: list[str], plan: list[Candidate]) -> dict[str, Any]:
+        """Write resolved `plan` of `requires`. Output is deterministic: the
+        same graph always gives the same file"""
+        names = {canonicalize_name(candidate.name) for candidate in plan}
+        packages: list[dict[str, Any]] = []
+        for candidate in plan:
+            wheel = candidate.pypi.selectWheel(candidate.version)
+            dependencies = {
+                canonicalize_name(Requirement(req).name)
+                for req in candidate.requiresDist
+            }
+            packages.append(
+                {
+                    "name": canonicalize_name(candidate.name),
+                    "version": candidate.version,
+                    "filename": wheel.filename,
+                    "url": wheel.url,
+                    "sha256": wheel.hashes.get("sha256"),
+                    "requires": sorted(dependencies & names),
+                }
+            )
+
+        content = {
+            "version": LOCK_VERSION,
+            "inputs": inputsHash(requires),
+            "packages": sorted(packages, key=lambda package: package["name"]),
+        }
+        temp = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+        with open(temp, "w", encoding="utf-8") as file:
+            file.write(json.dumps(content, indent=2, sort_keys=True) + "\n")
+        os.replace(temp, self.path)
+        return content
+
+    def candidates(
+        self,
+        requires: list[str],
+        cache: HttpCache | None = HTTP_CACHE,
+        wheelCache: WheelCache | None = WHEEL_CACHE,
+        pm: urllib3.PoolManager | None = None,
+    ) -> list[Candidate]:
+        """Returns install plan stored in the lock. Depth of every package is
+        its distance from `requires` in the locked graph"""
+        packages = {package["name"]: package for package in self.read()["packages"]}
+
+        depths: dict[str, int] = {}
+        frontier = [canonicalize_name(Requirement(req).name) for req in requires]
+        depth = 0
+        while frontier:
+            level = [
+                name for name in frontier if name in packages and name not in depths
+            ]
+            for name in level:
+                depths[name] = depth
+            frontier = [dep for name in level for dep in packages[name]["requires"]]
+            depth += 1
+
+        plan: list[Candidate] = []
+        for name, package in packages.items():
+            pypi = PyPi(name, cache=cache, wheelCache=wheelCache, pm=pm)
+            sha256 = package.get("sha256")
+            pypi.files = [
+                DistFile(
+                    package["filename"],
+                    package["url"],
+                    {"sha256": sha256} if sha256 else {},
+                )
+            ]
+            plan.append(
+                Candidate(
+                    Requirement(f"{name}=={package['version']}"),
+                    pypi,
+                    package["version"],
+                    depths.get(name, depth),
+                )
+            )
+        return plan
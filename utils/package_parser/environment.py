@@ -0,0 +1,96 @@
+"""
+This is a part of Python Package Manager
+
+Description of the running interpreter used to select distributions:
+wheel tags it supports in the order of priority and the environment of
+dependency markers. Probing the platform is slow on phones, so the result
+is stored on disk for every interpreter and reused until the interpreter
+binary changes
+
+(c) tankalxat34
+"""
+
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import threading
+
+from utils.constants import PPM_CACHE_PATH
+
+from . import packaging
+from .packaging.markers import Marker, _evaluate_markers, default_environment
+from .packaging.tags import Tag, sys_tags
+from .packaging.utils import InvalidWheelFilename, parse_wheel_filename
+
+INTERPRETERS_CACHE_PATH = pathlib.Path(PPM_CACHE_PATH, "interpreters")
+
+
+def _interpreterKey() -> str:
+    """Return key that changes when the interpreter is replaced or upgraded"""
+    try:
+        mtime = os.stat(sys.executable).st_mtime_ns
+    except OSError:
+        mtime = 0
+    key = f"{sys.executable}|{sys.version}|{mtime}|{packaging.__version__}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _interpreterInfo() -> dict:
+    path = pathlib.Path(INTERPRETERS_CACHE_PATH, f"{_interpreterKey()}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        pass
+
+    info = {
+        "executable": sys.executable,
+        "tags": [str(tag) for tag in sys_tags()],
+        "environment": default_environment(),
+    }
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        with open(temp, "w", encoding="utf-8") as file:
+            json.dump(info, file)
+        os.replace(temp, path)
+    except OSError:
+        pass
+    return info
+
+
+@functools.lru_cache(maxsize=None)
+def getSupportedTags() -> dict[Tag, int]:
+    """Return mapping of every supported tag to its rank, lower is better"""
+    ranks: dict[Tag, int] = {}
+    for rank, tag in enumerate(_interpreterInfo()["tags"]):
+        ranks.setdefault(Tag(*tag.split("-", 2)), rank)
+    return ranks
+
+
+def getMarkerEnvironment() -> dict[str, str]:
+    """Return environment of the running interpreter for dependency markers"""
+    return dict(_interpreterInfo()["environment"])
+
+
+def evaluateMarker(marker: Marker, extra: str = "") -> bool:
+    """Evaluate `marker` against cached environment of the running interpreter.
+    `Marker.evaluate` would probe the interpreter again on every call"""
+    environment = getMarkerEnvironment()
+    environment["extra"] = extra or ""
+    return _evaluate_markers(marker._markers, environment)
+
+
+def wheelRank(filename: str) -> int | None:
+    """Return rank of the best tag of wheel `filename` or `None` if the wheel
+    is not compatible with the running interpreter"""
+    try:
+        tags = parse_wheel_filename(filename)[3]
+    except InvalidWheelFilename:
+        return None
+    ranks = getSupportedTags()
+    return min((ranks[tag] for tag in tags if tag in ranks), default=None)
@@ -6,12 +6,11 @@ This package needs to parse information from files in `*.dist-info` dir
 (c) tankalxat34
 """
 
-import json
-import re
-import sys
-import os
 import pathlib
 
+from .metadata_cache import getMetadataCache
+from .site_index import getSiteIndex
+
 
 class PackageParser:
     def __init__(self, sitePath: str | pathlib.Path, packageName: str) -> None:
@@ -19,35 +18,46 @@ class PackageParser:
         self.path = sitePath
 
     def _readAsMetadataSyntax(self, filename: str):
-        content: str
+        """Parse headers of the file in email format. Reading stops at the
+        first empty line, the body is never read. Continuation lines, even
+        whitespace-only ones, are joined to the previous header, headers with
+        empty values are skipped"""
+        result: dict[str, list[str]] = {}
+        key: str | None = None
+        value: str = ""
+
+        def _add():
+            if key and value:
+                result.setdefault(key, []).append(value)
+
         with open(
             pathlib.Path(self.path, self.getDistInfo(), filename),
             "r",
             encoding="utf-8",
         ) as file:
-            content = file.read()
-        keyvalues = re.findall(r"^(\w\S+): *(.+)$", content, re.MULTILINE)
-
-        result: dict[str, list[str]] = {}
-
-        for t in keyvalues:
-            key, value = t
-            try:
-                result[key].append(value)
-            except Exception:
-                result[key] = [value]
+            for line in file:
+                line = line.rstrip("\r\n")
+                if not line:
+                    break
+                if line[0] in " \t":
+                    if key is not None:
+                        value = f"{value}\n{line.strip()}" if value else line.strip()
+                    continue
+
+                _add()
+                name, separator, rest = line.partition(":")
+                if separator and name and not any(c.isspace() for c in name):
+                    key, value = name, rest.strip()
+                else:
+                    key, value = None, ""
+        _add()
 
         return result
 
     def getDistInfo(self):
-        dirlist = os.listdir(self.path)
-
-        for dirname in dirlist:
-            if (
-                self.packageName == dirname.lower().split("-")[0]
-                and ".dist-info" in dirname.lower()
-            ):
-                return dirname
+        distribution = getSiteIndex(self.path).get(self.packageName)
+        if distribution is not None:
+            return distribution.distInfo
         raise NameError(
             f"You have not installed package with name '{self.packageName}'"
         )
@@ -75,13 +85,38 @@ class PackageParser:
         """
         return self._readAsMetadataSyntax("METADATA")
 
+    def getCachedMetadata(self) -> dict[str, list[str]]:
+        """Returns the main headers of `*.dist-info/METADATA` from the cache
+        of installed metadata, the file is read only when it has changed"""
+        return getMetadataCache(self.path).get(self.getDistInfo(), self.getMetadata)
+
+    def getVersion(self) -> str:
+        """Returns version of installed package"""
+        distribution = getSiteIndex(self.path).get(self.packageName)
+        if distribution is not None:
+            return distribution.version
+        return "".join(self.getMetadata()["Version"])
+
     def getWheel(self):
         """Returns parsed content from file `*.dist-info/WHEEL`"""
         return self._readAsMetadataSyntax("WHEEL")
 
+    def getInstaller(self) -> str:
+        """Returns content of `*.dist-info/INSTALLER`, the tool that installed
+        package, or empty string when it is unknown"""
+        try:
+            with open(
+                pathlib.Path(self.path, self.getDistInfo(), "INSTALLER"),
+                "r",
+                encoding="utf-8",
+            ) as file:
+                return file.read().strip()
+        except OSError:
+            return ""
+
     def isInstalled(self) -> bool:
         """Return `True` if package is installed"""
-        return os.path.exists(pathlib.Path(self.path, self.getDistInfo().lower()))
+        return self.packageName in getSiteIndex(self.path)
 
 
 """
@@ -0,0 +1,109 @@
+"""
+This is a part of Python Package Manager
+
+On-disk cache of headers of installed `METADATA` files. The file can hold
+a long description of hundreds of KB, while `view` and `freeze` need only
+a few headers. They are kept in one small JSON file per site-packages dir,
+every entry is keyed by its dist-info dir and stamped with modification
+time and size of `METADATA`, so a reinstalled package is parsed again
+
+(c) tankalxat34
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import pathlib
+import threading
+from typing import Callable
+
+from utils.constants import PPM_CACHE_PATH
+
+INSTALLED_CACHE_PATH = pathlib.Path(PPM_CACHE_PATH, "installed")
+# Bumped when parsing of `METADATA` changes, entries of the old format are
+# parsed again
+CACHE_FORMAT = 2
+CACHED_HEADERS = (
+    "Name",
+    "Version",
+    "Summary",
+    "Requires-Dist",
+    "Home-page",
+    "Author",
+    "Author-email",
+)
+
+
+class MetadataCache:
+    def __init__(
+        self,
+        sitePath: str | pathlib.Path,
+        path: str | pathlib.Path = INSTALLED_CACHE_PATH,
+    ) -> None:
+        self.sitePath = os.path.abspath(sitePath)
+        key = hashlib.sha256(self.sitePath.encode("utf-8")).hexdigest()
+        self.path = pathlib.Path(path, f"{key}.v{CACHE_FORMAT}.json")
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.entries: dict[str, dict] = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(
+        self, distInfo: str, parse: Callable[[], dict[str, list[str]]]
+    ) -> dict[str, list[str]]:
+        """Return cached headers of `distInfo`. When `METADATA` has changed
+        they are taken from `parse` and kept for the next time"""
+        stat = os.stat(pathlib.Path(self.sitePath, distInfo, "METADATA"))
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        with self._lock:
+            entry = self.entries.get(distInfo)
+            if entry is not None and entry["stamp"] == stamp:
+                return entry["headers"]
+
+        headers = {
+            key: value for key, value in parse().items() if key in CACHED_HEADERS
+        }
+        with self._lock:
+            self.entries[distInfo] = {"stamp": stamp, "headers": headers}
+            self._dirty = True
+        return headers
+
+    def save(self):
+        """Write changed entries, entries of removed packages are dropped"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = {
+                distInfo: entry
+                for distInfo, entry in self.entries.items()
+                if os.path.isdir(pathlib.Path(self.sitePath, distInfo))
+            }
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                temp = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+                with open(temp, "w", encoding="utf-8") as file:
+                    json.dump(entries, file)
+                os.replace(temp, self.path)
+            except OSError:
+                return
+            self.entries = entries
+            self._dirty = False
+
+
+_CACHES: dict[str, MetadataCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def getMetadataCache(sitePath: str | pathlib.Path) -> MetadataCache:
+    """Return shared cache of installed metadata of the dir `sitePath`. It is
+    saved when the program exits"""
+    key = os.path.abspath(sitePath)
+    with _CACHES_LOCK:
+        if key not in _CACHES:
+            _CACHES[key] = MetadataCache(key)
+            atexit.register(_CACHES[key].save)
+        return _CACHES[key]
@@ -9,9 +9,11 @@
 """
 
 import abc
+import bisect
 import itertools
 import re
 from typing import (
+    Any,
     Callable,
     Iterable,
     Iterator,
@@ -23,6 +25,7 @@ from typing import (
     Union,
 )
 
+from ._structures import Infinity, NegativeInfinity
 from .utils import canonicalize_version
 from .version import Version
 
@@ -252,6 +255,9 @@ class Specifier(BaseSpecifier):
         # Store whether or not this Specifier should accept prereleases
         self._prereleases = prereleases
 
+        # Compiled lazily by the intervals property
+        self._intervals: Optional[VersionIntervals] = None
+
     # https://github.com/python/mypy/pull/13475#pullrequestreview-1079784515
     @property  # type: ignore[override]
     def prereleases(self) -> bool:
@@ -367,6 +373,77 @@ class Specifier(BaseSpecifier):
 
         return self._canonical_spec == other._canonical_spec
 
+    @property
+    def intervals(self) -> "VersionIntervals":
+        """The versions this specifier can match, as :class:`VersionIntervals`.
+
+        Pre-releases are not filtered out here. ``===`` is compiled to all
+        versions, and for ``<`` and ``>`` the exclusion of pre-, post- and
+        local releases of the version in the specifier is only applied when
+        it forms an interval, so intervals may be wider than the specifier
+        and :meth:`contains` is still the exact check.
+
+        >>> Version("1.4") in Specifier("~=1.2").intervals
+        True
+        >>> Version("2.0") in Specifier("~=1.2").intervals
+        False
+        """
+        if self._intervals is None:
+            self._intervals = self._compile()
+        return self._intervals
+
+    def _compile(self) -> "VersionIntervals":
+        operator, spec = self._spec
+
+        if operator == "===":
+            return VersionIntervals.any()
+
+        if operator in ("==", "!=") and spec.endswith(".*"):
+            prefix = Version(spec[:-2])
+            intervals = VersionIntervals(
+                [_prefix_interval(prefix.epoch, prefix.release)]
+            )
+            return intervals if operator == "==" else ~intervals
+
+        version = Version(spec)
+        key = version._key
+        if operator in ("==", "!="):
+            if version.local:
+                intervals = VersionIntervals([(key, True, key, True)])
+            else:
+                intervals = VersionIntervals([(key, True, _after_locals(key), True)])
+            return intervals if operator == "==" else ~intervals
+
+        if operator == "~=":
+            prefix = _prefix_interval(version.epoch, version.release[:-1])
+            return VersionIntervals([(key, True, prefix[2], False)])
+
+        if operator == ">=":
+            return VersionIntervals([(key, True, _MAX, True)])
+
+        if operator == "<=":
+            return VersionIntervals([(_MIN, True, _after_locals(key), True)])
+
+        if operator == "<":
+            if version.is_prerelease:
+                return VersionIntervals([(_MIN, True, key, False)])
+            # Pre-releases of the base version are excluded, they are the
+            # lowest versions that share its release segment
+            base = key[:2]
+            return VersionIntervals(
+                [
+                    (_MIN, True, base + _LOWEST, False),
+                    (base + _FINAL, True, key, False),
+                ]
+            )
+
+        # operator == ">"
+        if not version.is_prerelease and not version.is_postrelease:
+            # Post-releases and local versions of the version are excluded,
+            # they are the highest versions that share its release segment
+            return VersionIntervals([(key[:2] + _HIGHEST, False, _MAX, True)])
+        return VersionIntervals([(key, False, _MAX, True)])
+
     def _get_operator(self, op: str) -> CallableOperator:
         operator_callable: CallableOperator = getattr(
             self, f"_compare_{self._operators[op]}"
@@ -678,6 +755,169 @@ def _pad_version(left: List[str], right: List[str]) -> Tuple[List[str], List[str
     return (list(itertools.chain(*left_split)), list(itertools.chain(*right_split)))
 
 
+# An interval of versions ``(low, low_closed, high, high_closed)``, where
+# bounds are comparison keys of :class:`Version`
+Interval = Tuple[Any, bool, Any, bool]
+
+# Keys below and above the key of any version
+_MIN = (NegativeInfinity,)
+_MAX = (Infinity,)
+
+# Tails of keys that follow the epoch and release segment of a version.
+# _LOWEST is below all versions with that release segment, _FINAL is the
+# final release itself and _HIGHEST is above all its post and local releases
+_LOWEST = (NegativeInfinity, NegativeInfinity, NegativeInfinity, NegativeInfinity)
+_FINAL = (Infinity, NegativeInfinity, Infinity, NegativeInfinity)
+_HIGHEST = (Infinity, Infinity, Infinity, Infinity)
+
+
+def _after_locals(key: Any) -> Any:
+    # Key above the version and all its local versions
+    return key[:5] + (Infinity,)
+
+
+def _prefix_interval(epoch: int, release: Tuple[int, ...]) -> Interval:
+    # Versions matching ``==release.*``
+    def strip(release: Tuple[int, ...]) -> Tuple[int, ...]:
+        return tuple(
+            reversed(list(itertools.dropwhile(lambda x: x == 0, reversed(release))))
+        )
+
+    bumped = release[:-1] + (release[-1] + 1,)
+    return (
+        (epoch, strip(release)) + _LOWEST,
+        True,
+        (epoch, strip(bumped)) + _LOWEST,
+        False,
+    )
+
+
+class VersionIntervals:
+    """A union of disjoint intervals of versions.
+
+    It is the compiled form of specifiers: intersection, union, complement,
+    emptiness and membership are computed on the bounds of intervals, so
+    conflicting specifiers are detected without enumerating any versions.
+
+    >>> required = SpecifierSet("<3,>=1.21.1").intervals
+    >>> intervals = required & SpecifierSet(">=2").intervals
+    >>> Version("2.2.1") in intervals
+    True
+    >>> Version("1.26.18") in intervals
+    False
+    >>> (SpecifierSet("<2").intervals & SpecifierSet(">=2").intervals).is_empty()
+    True
+    """
+
+    def __init__(self, intervals: Iterable[Interval] = ()) -> None:
+        self._intervals = self._normalize(intervals)
+        self._lows = [interval[0] for interval in self._intervals]
+
+    @classmethod
+    def any(cls) -> "VersionIntervals":
+        """Intervals that contain every version."""
+        return cls([(_MIN, True, _MAX, True)])
+
+    @staticmethod
+    def _normalize(intervals: Iterable[Interval]) -> List[Interval]:
+        # Drop empty intervals, sort the rest and merge the ones that touch
+        result: List[Interval] = []
+        for low, low_closed, high, high_closed in sorted(
+            (
+                interval
+                for interval in intervals
+                if interval[0] < interval[2]
+                or (interval[0] == interval[2] and interval[1] and interval[3])
+            ),
+            key=lambda interval: (interval[0], not interval[1]),
+        ):
+            if result:
+                last_low, last_low_closed, last_high, last_high_closed = result[-1]
+                if low < last_high or (
+                    low == last_high and (low_closed or last_high_closed)
+                ):
+                    if high > last_high or (high == last_high and high_closed):
+                        result[-1] = (last_low, last_low_closed, high, high_closed)
+                    continue
+            result.append((low, low_closed, high, high_closed))
+        return result
+
+    def __iter__(self) -> Iterator[Interval]:
+        """Iterate over the intervals in ascending order."""
+        return iter(self._intervals)
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def __repr__(self) -> str:
+        return f"<VersionIntervals({self._intervals!r})>"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, VersionIntervals):
+            return NotImplemented
+        return self._intervals == other._intervals
+
+    def __hash__(self) -> int:
+        return hash(tuple(self._intervals))
+
+    def is_empty(self) -> bool:
+        """Whether no version is contained in the intervals.
+
+        >>> SpecifierSet(">=2,<2").intervals.is_empty()
+        True
+        >>> SpecifierSet("==2.*,!=2.0").intervals.is_empty()
+        False
+        """
+        return not self._intervals
+
+    def __contains__(self, item: UnparsedVersion) -> bool:
+        key = _coerce_version(item)._key
+        index = bisect.bisect_right(self._lows, key) - 1
+        if index < 0:
+            return False
+        low, low_closed, high, high_closed = self._intervals[index]
+        return (low < key or low_closed) and (
+            key < high or (key == high and high_closed)
+        )
+
+    def __and__(self, other: "VersionIntervals") -> "VersionIntervals":
+        """Return the intervals of versions contained in both operands."""
+        if not isinstance(other, VersionIntervals):
+            return NotImplemented
+
+        result: List[Interval] = []
+        for low, low_closed, high, high_closed in self._intervals:
+            for other_low, other_low_closed, other_high, other_high_closed in other:
+                if other_low > high:
+                    break
+                if other_low == low:
+                    bottom = (low, low_closed and other_low_closed)
+                else:
+                    bottom = max((low, low_closed), (other_low, other_low_closed))
+                if other_high == high:
+                    top = (high, high_closed and other_high_closed)
+                else:
+                    top = min((high, high_closed), (other_high, other_high_closed))
+                result.append(bottom + top)
+        return VersionIntervals(result)
+
+    def __or__(self, other: "VersionIntervals") -> "VersionIntervals":
+        """Return the intervals of versions contained in any operand."""
+        if not isinstance(other, VersionIntervals):
+            return NotImplemented
+        return VersionIntervals(self._intervals + other._intervals)
+
+    def __invert__(self) -> "VersionIntervals":
+        """Return the intervals of versions that are not contained in these."""
+        result: List[Interval] = []
+        low, low_closed = _MIN, True
+        for start, start_closed, end, end_closed in self._intervals:
+            result.append((low, low_closed, start, not start_closed))
+            low, low_closed = end, not end_closed
+        result.append((low, low_closed, _MAX, True))
+        return VersionIntervals(result)
+
+
 class SpecifierSet(BaseSpecifier):
     """This class abstracts handling of a set of version specifiers.
 
@@ -778,6 +1018,18 @@ class SpecifierSet(BaseSpecifier):
     def __hash__(self) -> int:
         return hash(self._specs)
 
+    @property
+    def intervals(self) -> VersionIntervals:
+        """The versions all the specifiers can match, as :class:`VersionIntervals`.
+
+        >>> SpecifierSet(">=1.0,<1.0").intervals.is_empty()
+        True
+        """
+        intervals = VersionIntervals.any()
+        for spec in self._specs:
+            intervals &= spec.intervals
+        return intervals
+
     def __and__(self, other: Union["SpecifierSet", str]) -> "SpecifierSet":
         """Return a SpecifierSet which is a combination of the two sets.
 
@@ -0,0 +1,117 @@
+"""
+This is a part of Python Package Manager
+
+Index of distributions installed to the site-packages dir. It is built by
+a single pass over the dir: name and version of a distribution are taken
+from the name of its `*.dist-info` dir, so no metadata file is opened.
+One index is shared by all lookups of the same dir and is scanned again
+only when modification time of the dir changes
+
+(c) tankalxat34
+"""
+
+import os
+import pathlib
+import threading
+import time
+from typing import Iterator
+
+from .packaging.utils import canonicalize_name
+
+DIST_INFO = ".dist-info"
+
+# Modification time of a dir changed this close to the scan may be not
+# updated again by the next change on file systems with coarse timestamps
+RACY_INTERVAL_NS = 2 * 10**9
+
+
+class Distribution:
+    """Installed distribution found by its `*.dist-info` dir"""
+
+    def __init__(self, name: str, version: str, distInfo: str) -> None:
+        self.name = name
+        self.version = version
+        self.distInfo = distInfo
+
+    def __repr__(self) -> str:
+        return f"<Distribution {self.name}=={self.version}>"
+
+
+class SiteIndex:
+    def __init__(self, sitePath: str | pathlib.Path) -> None:
+        self.path = sitePath
+        self.distributions: dict[str, Distribution] = {}
+        self._mtime: int | None = None
+        self._scannedAt = 0
+        self._lock = threading.Lock()
+        self.scan()
+
+    def _stat(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self):
+        """Scan the dir again if it has changed since the last scan"""
+        with self._lock:
+            mtime = self._stat()
+            if mtime == self._mtime and (
+                mtime is None or self._scannedAt - mtime > RACY_INTERVAL_NS
+            ):
+                return
+            self._scan(mtime)
+
+    def scan(self):
+        """Read the site-packages dir again"""
+        with self._lock:
+            self._scan(self._stat())
+
+    def _scan(self, mtime: int | None):
+        self._mtime = mtime
+        self._scannedAt = time.time_ns()
+
+        distributions: dict[str, Distribution] = {}
+        try:
+            entries = list(os.scandir(self.path))
+        except OSError:
+            entries = []
+
+        for entry in entries:
+            if not entry.name.lower().endswith(DIST_INFO) or not entry.is_dir():
+                continue
+            name, _, version = entry.name[: -len(DIST_INFO)].rpartition("-")
+            if name:
+                distributions[canonicalize_name(name)] = Distribution(
+                    name, version, entry.name
+                )
+        self.distributions = distributions
+
+    def get(self, name: str) -> Distribution | None:
+        """Return installed distribution of project `name`"""
+        return self.distributions.get(canonicalize_name(name))
+
+    def __contains__(self, name: str) -> bool:
+        return canonicalize_name(name) in self.distributions
+
+    def __iter__(self) -> Iterator[Distribution]:
+        return iter(self.distributions.values())
+
+    def __len__(self) -> int:
+        return len(self.distributions)
+
+
+_INDEXES: dict[str, SiteIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def getSiteIndex(sitePath: str | pathlib.Path) -> SiteIndex:
+    """Return shared up-to-date index of the site-packages dir `sitePath`"""
+    key = os.path.abspath(sitePath)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            _INDEXES[key] = SiteIndex(key)
+            return _INDEXES[key]
+    index.refresh()
+    return index
@@ -45,7 +45,7 @@ class PpmConfig:
         if content.get(REQUIRES_DIST):
             for req in content[REQUIRES_DIST]:
                 r = Requirement(req)
-                resp += f"{r.name}=={''.join(PackageParser(PPM_PATH, constants.convertPackageName(r.name)).getMetadata()['Version'])}\n"
+                resp += f"{r.name}=={''.join(PackageParser(PPM_PATH, constants.convertPackageName(r.name)).getCachedMetadata()['Version'])}\n"
 
         with open(
             pathlib.Path(os.getcwd(), constants.PPM_REQUIREMENTS_TXT), "w"
@@ -0,0 +1,285 @@
+"""
+This is a part of Python Package Manager
+
+Counterpart of `PyPi` for asyncio applications. Methods that talk to the
+index are coroutines served by `AsyncHttpClient` in the event loop of the
+caller, parsing of project pages, the choice of releases and wheels are
+inherited from `PyPi`
+
+(c) tankalxat34
+"""
+
+import asyncio
+import hashlib
+import json
+import pathlib
+import tempfile
+import time
+from typing import BinaryIO
+from urllib.parse import urlsplit
+
+from .async_client import BODY_ERRORS, AsyncHttpClient, getAsyncClient
+from .cache import HttpCache
+from .client import MISSING_STATUSES, POOL_STATS, RETRY_STATUSES, createRetry
+from .lazy_wheel import (
+    PPM_RANGE_CHUNK,
+    PendingRemoteFile,
+    RangeNeeded,
+    RangeNotSupported,
+    rangeHeaders,
+    readWheelMetadata,
+)
+from .main import (
+    HTTP_CACHE,
+    METADATA_STORE,
+    PYPI_JSON,
+    PYPI_SIMPLE,
+    PYPI_VERSION_JSON,
+    WHEEL_CACHE,
+    PyPi,
+    _checkDigest,
+)
+from .metadata_store import MetadataStore, YankedProject
+from . import simple
+from .simple import SIMPLE_ACCEPT, DistFile
+from .wheel_cache import WheelCache
+from ..cli.main import Cli
+from ..package_parser.packaging.metadata import RawMetadata, parse_email
+from ..package_parser.packaging.utils import canonicalize_name
+
+# Characters of HTML project page parsed between returns to the event loop
+PARSE_SLICE = 64 * 1024
+
+
+async def parseProjectPage(body: bytes, url: str) -> list[DistFile]:
+    """`parseProjectPage` that gives control back to the event loop after
+    every slice of HTML page, a page of a project with thousands of files
+    takes a noticeable time to parse"""
+    if body.lstrip()[:1] == b"{":
+        return simple.parseProjectPage(body, url)
+    parser = simple._SimpleHtmlParser(url)
+    text = body.decode("utf-8", errors="replace")
+    for start in range(0, len(text), PARSE_SLICE):
+        parser.feed(text[start : start + PARSE_SLICE])
+        await asyncio.sleep(0)
+    parser.close()
+    return parser.files
+
+
+async def fetchWheelMetadata(client: AsyncHttpClient, url: str) -> bytes:
+    """Return content of `*.dist-info/METADATA` of the remote wheel using
+    HTTP range requests"""
+    file = PendingRemoteFile(url)
+    byteRange = f"-{PPM_RANGE_CHUNK}"
+    while True:
+        response = await client.open("GET", url, rangeHeaders(byteRange))
+        try:
+            data = await response.read() if response.status == 206 else b""
+            contentRange = response.headers.get("Content-Range", "")
+            file.store(response.status, contentRange, lambda: data)
+        finally:
+            response.release()
+        try:
+            return readWheelMetadata(file)
+        except RangeNeeded as needed:
+            byteRange = needed.byteRange
+
+
+class AsyncPyPi(PyPi):
+    def __init__(
+        self,
+        packageName: str,
+        cache: HttpCache | None = HTTP_CACHE,
+        wheelCache: WheelCache | None = WHEEL_CACHE,
+        client: AsyncHttpClient | None = None,
+        store: MetadataStore | None = METADATA_STORE,
+    ) -> None:
+        super().__init__(packageName, cache, wheelCache, store=store)
+        self.client = client or getAsyncClient()
+
+    async def _get(self, url: str, headers: dict[str, str] | None = None) -> bytes:
+        """Return body of `url` using cached response when it is possible"""
+        entry = self.cache.get(url) if self.cache else None
+        if entry and entry.isFresh(self.cache.ttl):
+            return entry.body
+
+        headers = dict(headers or {})
+        if entry:
+            headers.update(entry.conditionalHeaders())
+        started = time.perf_counter()
+        response = await self.client.request("GET", url, headers)
+        POOL_STATS.request(
+            urlsplit(url).hostname, response.version, time.perf_counter() - started
+        )
+        if response.status == 304 and entry:
+            return self.cache.refresh(url, entry, response.headers).body
+        if response.status == 404:
+            raise NameError(f"Package '{self.name}' was not found on PyPi")
+        if response.status in RETRY_STATUSES:
+            raise ConnectionError(f"Index responded {response.status} to '{url}'")
+        if self.cache and response.status == 200:
+            self.cache.store(url, response.data, response.headers)
+        return response.data
+
+    async def fetch(self):
+        url = PYPI_JSON.format(name=self.name)
+        self.json = json.loads(await self._get(url))
+        return self.json
+
+    async def _fetchFiles(self, url: str) -> list[DistFile]:
+        page = await self._get(url, {"Accept": SIMPLE_ACCEPT})
+        files = await parseProjectPage(page, url)
+        if not files:
+            raise NameError(f"Package '{self.name}' has no files on PyPi")
+        if all(file.yanked for file in files):
+            raise YankedProject(self.name, files)
+        return files
+
+    async def fetchSimple(self, allowYanked: bool = False) -> list[DistFile]:
+        url = PYPI_SIMPLE.format(name=canonicalize_name(self.name))
+        self._releaseIndexes.clear()
+        try:
+            if self.store is None:
+                self.files = await self._fetchFiles(url)
+            else:
+                self.files = await self.store.getAsync(
+                    url, lambda: self._fetchFiles(url)
+                )
+        except YankedProject as error:
+            if not allowYanked:
+                raise
+            self.files = error.files
+        return self.files
+
+    async def fetchCoreMetadata(self, file: DistFile) -> RawMetadata:
+        data = await self._get(file.metadataUrl)
+        if isinstance(file.core_metadata, dict) and "sha256" in file.core_metadata:
+            if hashlib.sha256(data).hexdigest() != file.core_metadata["sha256"]:
+                raise ValueError(f"Hash mismatch of metadata '{file.metadataUrl}'")
+        raw, _ = parse_email(data)
+        return raw
+
+    async def fetchWheelMetadata(self, file: DistFile) -> RawMetadata:
+        entry = self.cache.get(file.metadataUrl) if self.cache else None
+        if entry:
+            data = entry.body
+        else:
+            data = await fetchWheelMetadata(self.client, file.url)
+            if self.cache:
+                self.cache.store(file.metadataUrl, data, {})
+        raw, _ = parse_email(data)
+        return raw
+
+    async def fetchMetadata(self, version: str) -> RawMetadata:
+        coreFile, wheel = self._metadataSource(version)
+        if coreFile is not None:
+            return await self.fetchCoreMetadata(coreFile)
+        if wheel is not None:
+            try:
+                return await self.fetchWheelMetadata(wheel)
+            except RangeNotSupported:
+                pass
+        raise NameError(f"Metadata of '{self.name}=={version}' is not served by index")
+
+    async def fetchRequiresDist(self, version: str) -> list[str]:
+        if self.store is None:
+            return await self._fetchRequiresDist(version)
+        return await self.store.getAsync(
+            ("requires-dist", canonicalize_name(self.name), version),
+            lambda: self._fetchRequiresDist(version),
+        )
+
+    async def _fetchRequiresDist(self, version: str) -> list[str]:
+        try:
+            return (await self.fetchMetadata(version)).get("requires_dist", [])
+        except NameError:
+            pass
+
+        try:
+            url = PYPI_VERSION_JSON.format(name=self.name, version=version)
+            info = json.loads(await self._get(url))["info"]
+        except NameError:
+            info = (self.json or await self.fetch())["info"]
+            if info["version"] != version:
+                raise
+        return info["requires_dist"] or []
+
+    async def fetchArchive(self, version: str = "") -> BinaryIO:
+        return await self.downloadFile(self.selectWheel(version))
+
+    async def _stream(self, url: str, target: BinaryIO) -> str:
+        sha256 = hashlib.sha256()
+        retries = createRetry()
+        written = 0
+        while True:
+            headers = {"Range": f"bytes={written}-"} if written else None
+            response = await self.client.open("GET", url, headers, retries)
+            retries = response.retries
+            try:
+                if written and response.status == 200:
+                    target.seek(0)
+                    target.truncate()
+                    sha256 = hashlib.sha256()
+                    written = 0
+                elif response.status != (206 if written else 200) or (
+                    written
+                    and not response.headers.get("Content-Range", "").startswith(
+                        f"bytes {written}-"
+                    )
+                ):
+                    if response.status in MISSING_STATUSES:
+                        raise NameError(
+                            f"Failed to download '{url}', status {response.status}"
+                        )
+                    # Throttling, outage of the index or a broken range are not
+                    # a problem of the release, the install has to stop
+                    raise ConnectionError(
+                        f"Failed to download '{url}', status {response.status}"
+                    )
+                async for chunk in response.stream():
+                    sha256.update(chunk)
+                    target.write(chunk)
+                    written += len(chunk)
+                    self.bytesDownloaded += len(chunk)
+                return sha256.hexdigest()
+            except BODY_ERRORS as error:
+                response.release()
+                retries = await self.client.backoff(retries, "GET", url, error)
+            finally:
+                response.release()
+
+    async def downloadFile(self, file: DistFile) -> BinaryIO:
+        """Return opened `file` taken from wheel cache or downloaded from the
+        index. A cancelled download leaves no partial file behind"""
+        digest = file.hashes.get("sha256")
+        if digest and self.wheelCache:
+            cached = self.wheelCache.get(digest)
+            if cached is not None:
+                Cli.stdout(f"Using cached wheel '{file.filename}'", level=1)
+                return cached
+
+        Cli.stdout(f"Fetching wheel '{file.filename}'", level=1)
+        if not (digest and self.wheelCache):
+            target = tempfile.TemporaryFile()
+            try:
+                actual = await self._stream(file.url, target)
+                _checkDigest(file, digest, actual)
+            except BaseException:
+                target.close()
+                raise
+            target.seek(0)
+            return target
+
+        tempPath = self.wheelCache.tempPath(digest)
+        try:
+            with open(tempPath, "wb") as target:
+                actual = await self._stream(file.url, target)
+            _checkDigest(file, digest, actual)
+        except BaseException:
+            pathlib.Path(tempPath).unlink(missing_ok=True)
+            raise
+        return self.wheelCache.commit(tempPath, digest)
+
+    async def setup(self, path: str | pathlib.Path, version: str = ""):
+        with await self.fetchArchive(version) as archive:
+            return self.upackArchive(archive, path)
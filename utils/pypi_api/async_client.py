@@ -0,0 +1,396 @@
+"""
+This is a part of Python Package Manager
+
+Minimal HTTP/1.1 client on asyncio streams for `AsyncPyPi`. Like the pool
+manager of the threaded code it keeps alive up to `maxsize` connections
+per host and runs no more requests to a host at once, but it works in the
+event loop of the caller: no thread is started by the client itself (host
+names are looked up by asyncio in its default executor), and a request
+cancelled in the middle closes its connection instead of returning it to
+the pool. Failed requests are retried by the policy of the threaded code
+(`IndexRetry`) and a throttling host gets fewer requests at once
+
+(c) tankalxat34
+"""
+
+import asyncio
+import weakref
+from collections import deque
+from typing import AsyncIterator
+from urllib.parse import SplitResult, urljoin, urlsplit
+
+from .client import (
+    POOL_STATS,
+    THROTTLE_STATUSES,
+    HostLimiter,
+    IndexRetry,
+    createRetry,
+    createSSLContext,
+)
+from .urllib3._collections import HTTPHeaderDict
+from .urllib3.exceptions import MaxRetryError
+from ..constants import PPM_DOWNLOAD_CHUNK, PPM_MAX_WORKERS, PPM_VERSION
+
+ASYNC_TIMEOUT = 30.0
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+# (scheme, host, port)
+HostKey = tuple[str, str, int]
+# Errors of a request that is worth another try
+RETRY_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+# Errors of a connection broken in the middle of response body
+BODY_ERRORS = (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def isAlive(self) -> bool:
+        return not self.reader.at_eof() and not self.writer.is_closing()
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncHostLimiter(HostLimiter):
+    """`HostLimiter` for coroutines of one event loop"""
+
+    def __init__(self, maximum: int) -> None:
+        super().__init__(maximum)
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def _wake(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def acquireAsync(self):
+        while not self.acquire(0):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+    def release(self):
+        super().release()
+        self._wake()
+
+    def feedback(self, status: int):
+        super().feedback(status)
+        self._wake()
+
+
+class AsyncResponse:
+    """Response whose body is read by `read` or `stream`. It holds the
+    connection until `release` is called"""
+
+    version = 11
+
+    def __init__(
+        self,
+        client: "AsyncHttpClient",
+        key: HostKey,
+        conn: _Connection,
+        method: str,
+        status: int,
+        headers: HTTPHeaderDict,
+    ) -> None:
+        self.status = status
+        self.headers = headers
+        self.data = b""
+        self.retries: IndexRetry | None = None
+
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._released = False
+
+        length = headers.get("content-length")
+        self._chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+        self._remaining = int(length) if length and not self._chunked else None
+        self._chunkLeft = 0
+        self._done = (
+            method == "HEAD"
+            or status in (204, 304)
+            or status < 200
+            or self._remaining == 0
+        )
+        self._keepAlive = headers.get("connection", "").lower() != "close" and (
+            self._done or self._chunked or self._remaining is not None
+        )
+
+    async def _readChunk(self, size: int) -> bytes:
+        reader = self._conn.reader
+        if self._chunked:
+            if not self._chunkLeft:
+                line = await reader.readline()
+                self._chunkLeft = int(line.split(b";")[0].strip() or b"0", 16)
+                if not self._chunkLeft:
+                    # Trailers of the body end with an empty line
+                    while (await reader.readline()).strip():
+                        pass
+                    self._done = True
+                    return b""
+            data = await reader.read(min(size, self._chunkLeft))
+            if not data:
+                raise ConnectionError("Connection closed in the middle of response")
+            self._chunkLeft -= len(data)
+            if not self._chunkLeft:
+                await reader.readexactly(2)
+            return data
+
+        data = await reader.read(
+            size if self._remaining is None else min(size, self._remaining)
+        )
+        if self._remaining is None:
+            self._done = not data
+            return data
+        if not data:
+            raise ConnectionError("Connection closed in the middle of response")
+        self._remaining -= len(data)
+        self._done = not self._remaining
+        return data
+
+    async def stream(self, size: int = PPM_DOWNLOAD_CHUNK) -> AsyncIterator[bytes]:
+        """Yield the body chunk by chunk"""
+        while not self._done:
+            chunk = await self._client._wait(self._readChunk(size))
+            if chunk:
+                yield chunk
+
+    async def read(self) -> bytes:
+        """Read the whole body, it is kept in `data`"""
+        self.data = b"".join([chunk async for chunk in self.stream()])
+        return self.data
+
+    def get_redirect_location(self) -> str | None | bool:
+        """Location of a redirect or `False`, like urllib3 responses"""
+        if self.status in REDIRECT_STATUSES:
+            return self.headers.get("location")
+        return False
+
+    def release(self):
+        """Give the connection back. It is kept alive only when the body was
+        read to the end"""
+        if not self._released:
+            self._released = True
+            self._client._release(self._key, self._conn, self._done and self._keepAlive)
+
+
+class AsyncHttpClient:
+    def __init__(
+        self, maxsize: int = PPM_MAX_WORKERS, timeout: float = ASYNC_TIMEOUT
+    ) -> None:
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.context = createSSLContext()
+        self._idle: dict[HostKey, list[_Connection]] = {}
+        self._limits: dict[HostKey, AsyncHostLimiter] = {}
+
+    async def _wait(self, awaitable):
+        return await asyncio.wait_for(awaitable, self.timeout)
+
+    async def _connect(self, key: HostKey) -> _Connection:
+        scheme, host, port = key
+        secure = scheme == "https"
+        reader, writer = await self._wait(
+            asyncio.open_connection(
+                host,
+                port,
+                ssl=self.context if secure else None,
+                server_hostname=host if secure else None,
+            )
+        )
+        return _Connection(reader, writer)
+
+    def _release(self, key: HostKey, conn: _Connection, reusable: bool):
+        if reusable and conn.isAlive():
+            self._idle.setdefault(key, []).append(conn)
+        else:
+            conn.close()
+        self._limits[key].release()
+
+    async def _exchange(
+        self,
+        key: HostKey,
+        conn: _Connection,
+        method: str,
+        request: bytes,
+    ) -> AsyncResponse:
+        try:
+            conn.writer.write(request)
+            await self._wait(conn.writer.drain())
+            statusLine = await self._wait(conn.reader.readline())
+            if not statusLine:
+                raise ConnectionError(f"'{key[1]}' has closed the connection")
+            version, status = statusLine.decode("latin-1").split(None, 2)[:2]
+
+            headers = HTTPHeaderDict()
+            while line := (await self._wait(conn.reader.readline())).strip():
+                name, _, value = line.decode("latin-1").partition(":")
+                headers.add(name.strip(), value.strip())
+        except BaseException:
+            conn.close()
+            raise
+
+        response = AsyncResponse(self, key, conn, method, int(status), headers)
+        if version == "HTTP/1.0":
+            response._keepAlive = False
+        return response
+
+    async def _send(
+        self, key: HostKey, method: str, split: SplitResult, headers: dict[str, str]
+    ) -> AsyncResponse:
+        path = split.path or "/"
+        if split.query:
+            path += f"?{split.query}"
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {split.netloc}"]
+        headers = {
+            "User-Agent": f"ppm/{PPM_VERSION}",
+            "Accept-Encoding": "identity",
+            **headers,
+        }
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        idle = self._idle.get(key, [])
+        while idle:
+            conn = idle.pop()
+            if not conn.isAlive():
+                conn.close()
+                continue
+            POOL_STATS.connection(key[1], True)
+            try:
+                return await self._exchange(key, conn, method, request)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Server has closed the idle connection, the request is
+                # sent again over a new one
+                continue
+
+        conn = await self._connect(key)
+        POOL_STATS.connection(key[1], False)
+        return await self._exchange(key, conn, method, request)
+
+    async def backoff(
+        self,
+        retries: IndexRetry,
+        method: str,
+        url: str,
+        error: BaseException,
+    ) -> IndexRetry:
+        """Return `retries` incremented by `error` after waiting for the
+        backoff. Raises `error` when no retry is left"""
+        try:
+            retries = retries.increment(method, url, error=error)
+        except MaxRetryError:
+            raise error
+        await asyncio.sleep(retries.get_backoff_time())
+        return retries
+
+    async def open(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        retries: IndexRetry | None = None,
+    ) -> AsyncResponse:
+        """Send request and read the head of response. The caller reads the
+        body and must `release` the response. Connection errors and statuses
+        of a failing index are retried, the response keeps the `retries`
+        left"""
+        split = urlsplit(url)
+        key = (
+            split.scheme,
+            split.hostname,
+            split.port or (443 if split.scheme == "https" else 80),
+        )
+        limit = self._limits.setdefault(key, AsyncHostLimiter(self.maxsize))
+        retries = retries or createRetry()
+        while True:
+            await limit.acquireAsync()
+            try:
+                response = await self._send(key, method, split, dict(headers or {}))
+            except RETRY_ERRORS as error:
+                limit.release()
+                retries = await self.backoff(retries, method, url, error)
+                continue
+            except BaseException:
+                limit.release()
+                raise
+
+            limit.feedback(response.status)
+            if response.status in THROTTLE_STATUSES:
+                POOL_STATS.throttle(key[1])
+            response.retries = retries
+            hasRetryAfter = "retry-after" in response.headers
+            if not retries.is_retry(method, response.status, hasRetryAfter):
+                return response
+            try:
+                retries = retries.increment(method, url, response=response)
+            except MaxRetryError:
+                return response
+            try:
+                await response.read()
+            except RETRY_ERRORS:
+                pass
+            finally:
+                response.release()
+            delay = retries.get_retry_after(response) if hasRetryAfter else None
+            await asyncio.sleep(
+                retries.get_backoff_time() if delay is None else delay
+            )
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        redirect: bool = True,
+    ) -> AsyncResponse:
+        """Return response with the whole body read into `data`"""
+        retries = createRetry()
+        redirects = 0
+        while True:
+            response = await self.open(method, url, headers, retries)
+            retries = response.retries
+            try:
+                await response.read()
+            except BODY_ERRORS as error:
+                response.release()
+                retries = await self.backoff(retries, method, url, error)
+                continue
+            finally:
+                response.release()
+            location = response.get_redirect_location()
+            redirects += 1
+            if not redirect or not location or redirects >= MAX_REDIRECTS:
+                return response
+            url = urljoin(url, location)
+
+    async def close(self):
+        """Close idle connections"""
+        connections = [conn for idle in self._idle.values() for conn in idle]
+        self._idle.clear()
+        for conn in connections:
+            conn.close()
+        for conn in connections:
+            try:
+                await conn.writer.wait_closed()
+            except OSError:
+                pass
+
+
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHttpClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def getAsyncClient() -> AsyncHttpClient:
+    """Return client shared by coroutines of the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _CLIENTS:
+        _CLIENTS[loop] = AsyncHttpClient()
+    return _CLIENTS[loop]
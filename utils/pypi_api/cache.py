@@ -0,0 +1,101 @@
+"""
+This is a part of Python Package Manager
+
+On-disk cache of responses from the package index. Entries are keyed by
+URL and keep `ETag`/`Last-Modified` validators of the response, so a stale
+entry is revalidated by a conditional request that costs a single
+`304 Not Modified` instead of downloading the whole document again
+
+(c) tankalxat34
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import time
+
+from utils.constants import PPM_CACHE_PATH, PPM_METADATA_TTL
+
+
+class CacheEntry:
+    def __init__(self, body: bytes, meta: dict) -> None:
+        self.body = body
+        self.meta = meta
+
+    def isFresh(self, ttl: float) -> bool:
+        """Return `True` if entry can be used without asking the index"""
+        return time.time() - self.meta.get("fetched", 0) < ttl
+
+    def conditionalHeaders(self) -> dict[str, str]:
+        """Return headers that make a request conditional on this entry"""
+        headers: dict[str, str] = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+
+class HttpCache:
+    """Every entry is one file: the JSON line with metadata followed by the body"""
+
+    def __init__(
+        self,
+        path: str | pathlib.Path = pathlib.Path(PPM_CACHE_PATH, "http"),
+        ttl: float = PPM_METADATA_TTL,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.ttl = ttl
+
+    def _entryPath(self, url: str) -> pathlib.Path:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return pathlib.Path(self.path, key[:2], key[2:])
+
+    def get(self, url: str) -> CacheEntry | None:
+        try:
+            with open(self._entryPath(url), "rb") as file:
+                meta = json.loads(file.readline())
+                body = file.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        return CacheEntry(body, meta)
+
+    def _write(self, url: str, entry: CacheEntry):
+        path = self._entryPath(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        with open(temp, "wb") as file:
+            file.write(json.dumps(entry.meta).encode("utf-8") + b"\n")
+            file.write(entry.body)
+        os.replace(temp, path)
+
+    def store(self, url: str, body: bytes, headers) -> CacheEntry:
+        """Save response `body` with validators from response `headers`"""
+        entry = CacheEntry(
+            body,
+            {
+                "url": url,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "fetched": time.time(),
+            },
+        )
+        try:
+            self._write(url, entry)
+        except OSError:
+            pass
+        return entry
+
+    def refresh(self, url: str, entry: CacheEntry, headers) -> CacheEntry:
+        """Mark `entry` as fresh after `304 Not Modified`"""
+        entry.meta["fetched"] = time.time()
+        entry.meta["etag"] = headers.get("ETag") or entry.meta.get("etag")
+        try:
+            self._write(url, entry)
+        except OSError:
+            pass
+        return entry
@@ -0,0 +1,344 @@
+"""
+This is a part of Python Package Manager
+
+Process-wide HTTP client. Every `PyPi`, the resolver and the install
+pipeline share one `PoolManager`, so connections to pypi.org and
+files.pythonhosted.org are kept alive and reused instead of paying a TCP
+and TLS handshake per request. A connection that has to be opened again
+resumes the last TLS session of its host. Pools count connections taken
+alive and opened anew, `ppm config` shows the counters.
+
+Failed requests are retried by `IndexRetry` with jittered exponential
+backoff, `Retry-After` of a throttling index is respected. While a host
+throttles, `HostLimiter` lowers the number of requests sent to it at once
+
+(c) tankalxat34
+"""
+
+import random
+import ssl
+import threading
+from itertools import takewhile
+from urllib.parse import urlsplit
+
+from . import urllib3
+from .urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from .urllib3.exceptions import EmptyPoolError, InvalidHeader
+from .urllib3.util.retry import Retry
+from ..constants import (
+    PPM_BACKOFF_FACTOR,
+    PPM_BACKOFF_MAX,
+    PPM_CONNECT_TIMEOUT,
+    PPM_MAX_WORKERS,
+    PPM_POOL_BLOCK,
+    PPM_READ_TIMEOUT,
+    PPM_RETRIES,
+    PPM_RETRY_AFTER_MAX,
+)
+
+HTTP_VERSIONS = {10: "HTTP/1.0", 11: "HTTP/1.1", 20: "HTTP/2"}
+# Statuses of an overloaded or failing index that are worth another try
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# Statuses by which the index asks to slow down
+THROTTLE_STATUSES = frozenset([429, 503])
+# Statuses of a file that is not on the index, the release is broken
+MISSING_STATUSES = frozenset([404, 410])
+
+
+class HostStats:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.resumed = 0
+        self.retried = 0
+        self.throttled = 0
+        # Count and total seconds of metadata requests by HTTP version
+        self.requests: dict[int, list[float]] = {}
+
+    def __str__(self) -> str:
+        result = (
+            f"{self.hits} reused, {self.misses} opened, "
+            f"{self.resumed} TLS sessions resumed"
+        )
+        for version, (count, seconds) in sorted(self.requests.items()):
+            result += (
+                f", {int(count)} requests over {HTTP_VERSIONS.get(version, version)}"
+                f" in {seconds / count * 1000:.0f} ms avg"
+            )
+        if self.retried or self.throttled:
+            result += f", {self.retried} retried, {self.throttled} throttled"
+        return result
+
+
+class PoolStats:
+    """Counters of connection reuse per host"""
+
+    def __init__(self) -> None:
+        self.hosts: dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> HostStats:
+        return self.hosts.setdefault(host, HostStats())
+
+    def connection(self, host: str, reused: bool):
+        with self._lock:
+            stats = self._host(host)
+            if reused:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+
+    def handshake(self, host: str, resumed: bool):
+        if resumed:
+            with self._lock:
+                self._host(host).resumed += 1
+
+    def request(self, host: str, version: int, seconds: float):
+        with self._lock:
+            timing = self._host(host).requests.setdefault(version, [0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+
+    def retry(self, host: str):
+        with self._lock:
+            self._host(host).retried += 1
+
+    def throttle(self, host: str):
+        with self._lock:
+            self._host(host).throttled += 1
+
+    def summary(self) -> str:
+        with self._lock:
+            if not self.hosts:
+                return "no connections yet"
+            return "; ".join(
+                f"{host}: {stats}" for host, stats in sorted(self.hosts.items())
+            )
+
+
+POOL_STATS = PoolStats()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """Client context that offers the last TLS session of a host to new
+    connections to it, so the full handshake is done once per host"""
+
+    def __init__(self, protocol: int = ssl.PROTOCOL_TLS_CLIENT) -> None:
+        self._sessionsLock = threading.Lock()
+        self._sessions: dict[str, ssl.SSLSession] = {}
+
+    def remember(self, host: str, sock: ssl.SSLSocket):
+        """Keep session of `sock`. TLS 1.3 tickets arrive after the handshake,
+        so it is taken when a response was read, not right after connect"""
+        try:
+            session = sock.session
+        except (OSError, ValueError):
+            return
+        if session is not None and (session.has_ticket or session.id):
+            with self._sessionsLock:
+                self._sessions[host] = session
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        if session is None and server_hostname:
+            with self._sessionsLock:
+                session = self._sessions.get(server_hostname)
+        sslSocket = super().wrap_socket(
+            sock, *args, server_hostname=server_hostname, session=session, **kwargs
+        )
+        if server_hostname:
+            POOL_STATS.handshake(server_hostname, sslSocket.session_reused)
+        return sslSocket
+
+
+def createSSLContext() -> ResumingSSLContext:
+    """Return verifying client context with default CA certificates"""
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.load_default_certs()
+    return context
+
+
+class IndexRetry(Retry):
+    """Retry policy of requests to the index. Every retry waits for an
+    exponential backoff with random jitter, so clients that failed together
+    do not come back together. `Retry-After` of 429 and 503 responses is
+    respected up to `PPM_RETRY_AFTER_MAX` seconds"""
+
+    def get_backoff_time(self) -> float:
+        errors = len(
+            list(
+                takewhile(lambda x: x.redirect_location is None, reversed(self.history))
+            )
+        )
+        if not errors:
+            return 0
+        backoff = min(self.backoff_max, self.backoff_factor * 2 ** (errors - 1))
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def get_retry_after(self, response) -> float | None:
+        try:
+            retryAfter = super().get_retry_after(response)
+        except InvalidHeader:
+            return None
+        return None if retryAfter is None else min(retryAfter, PPM_RETRY_AFTER_MAX)
+
+    def increment(
+        self,
+        method: str | None = None,
+        url: str | None = None,
+        response=None,
+        error: Exception | None = None,
+        _pool=None,
+        _stacktrace=None,
+    ) -> Retry:
+        retries = super().increment(method, url, response, error, _pool, _stacktrace)
+        if error is not None or (response and not response.get_redirect_location()):
+            POOL_STATS.retry(_pool.host if _pool else urlsplit(url).hostname)
+        return retries
+
+
+def createRetry() -> IndexRetry:
+    """Return retry policy of index requests. Statuses that are still bad
+    after the last retry are returned to the caller instead of raised"""
+    return IndexRetry(
+        total=PPM_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=PPM_BACKOFF_FACTOR,
+        backoff_max=PPM_BACKOFF_MAX,
+        raise_on_status=False,
+    )
+
+
+class HostLimiter:
+    """Number of requests sent to one host at once that adapts to throttling
+    (AIMD): every 429 or 503 response halves the limit, every other response
+    raises it by `1 / limit` back up to `maximum`. With `strict` no more than
+    `maximum` requests are sent at once, otherwise requests are limited only
+    while the host throttles"""
+
+    def __init__(self, maximum: int, strict: bool = True) -> None:
+        self.maximum = maximum
+        self.strict = strict
+        self.limit = float(maximum)
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def _isFree(self) -> bool:
+        if not self.strict and self.limit >= self.maximum:
+            return True
+        return self.active < int(self.limit)
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(self._isFree, timeout):
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def feedback(self, status: int):
+        """Adjust the limit by `status` of a response of the host"""
+        with self._cond:
+            if status in THROTTLE_STATUSES:
+                self.limit = max(1.0, self.limit / 2)
+            elif self.limit < self.maximum:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+                self._cond.notify_all()
+
+
+class _LimitedPool:
+    """Part of pools that counts connections and passes requests through
+    `HostLimiter` of the host"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.limiter = HostLimiter(self.pool.maxsize, strict=self.block)
+
+    def _get_conn(self, timeout: float | None = None):
+        if not self.limiter.acquire(timeout):
+            raise EmptyPoolError(self, f"'{self.host}' is throttling requests")
+        try:
+            conn = super()._get_conn(timeout)
+        except EmptyPoolError:
+            # `urlopen` puts back a connection after any other error
+            self.limiter.release()
+            raise
+        POOL_STATS.connection(self.host, getattr(conn, "sock", None) is not None)
+        return conn
+
+    def _put_conn(self, conn):
+        self.limiter.release()
+        super()._put_conn(conn)
+
+    def _make_request(self, *args, **kwargs):
+        response = super()._make_request(*args, **kwargs)
+        self.limiter.feedback(response.status)
+        if response.status in THROTTLE_STATUSES:
+            POOL_STATS.throttle(self.host)
+        return response
+
+
+class CountingHTTPConnectionPool(_LimitedPool, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(_LimitedPool, HTTPSConnectionPool):
+    def _put_conn(self, conn):
+        sock = getattr(conn, "sock", None)
+        if isinstance(getattr(sock, "context", None), ResumingSSLContext):
+            sock.context.remember(self.host, sock)
+        super()._put_conn(conn)
+
+
+class IndexPoolManager(urllib3.PoolManager):
+    def urlopen(self, method: str, url: str, redirect: bool = True, **kw):
+        # Redirected requests keep the retry policy of the pools
+        kw.setdefault("retries", self.connection_pool_kw["retries"])
+        return super().urlopen(method, url, redirect=redirect, **kw)
+
+
+def createPoolManager(
+    maxsize: int = PPM_MAX_WORKERS, block: bool = PPM_POOL_BLOCK
+) -> urllib3.PoolManager:
+    """Return pool manager that keeps alive up to `maxsize` connections per
+    host. With `block` no more than `maxsize` connections are opened"""
+    pm = IndexPoolManager(
+        maxsize=maxsize,
+        block=block,
+        ssl_context=createSSLContext(),
+        retries=createRetry(),
+        timeout=urllib3.Timeout(connect=PPM_CONNECT_TIMEOUT, read=PPM_READ_TIMEOUT),
+    )
+    pm.pool_classes_by_scheme = {
+        "http": CountingHTTPConnectionPool,
+        "https": CountingHTTPSConnectionPool,
+    }
+    return pm
+
+
+_POOL: urllib3.PoolManager | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def configurePool(maxsize: int = PPM_MAX_WORKERS, block: bool = PPM_POOL_BLOCK):
+    """Set size of the shared pool. Connections of the old one are closed"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            kw = _POOL.connection_pool_kw
+            if kw.get("maxsize") == maxsize and kw.get("block") == block:
+                return
+            _POOL.clear()
+        _POOL = createPoolManager(maxsize, block)
+
+
+def getPoolManager() -> urllib3.PoolManager:
+    """Return pool manager shared by the whole process"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = createPoolManager()
+        return _POOL
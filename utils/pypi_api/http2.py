@@ -0,0 +1,360 @@
+"""
+This is a part of Python Package Manager
+
+Opt-in HTTP/2 transport for index metadata. Resolution issues hundreds of
+small GETs of project pages and metadata; over HTTP/2 they are multiplexed
+as concurrent streams of one connection per host instead of waiting for a
+free connection of the HTTP/1.1 pool. It needs the optional package `h2`:
+without it, or when a server does not negotiate HTTP/2, requests go to the
+usual HTTP/1.1 pools
+
+(c) tankalxat34
+"""
+
+import gzip
+import select
+import socket
+import ssl
+import threading
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.settings
+except ImportError:
+    h2 = None
+
+from . import urllib3
+from .client import POOL_STATS, RETRY_STATUSES, createSSLContext
+from .urllib3._collections import HTTPHeaderDict
+
+H2_TIMEOUT = 30.0
+# Large receive window lets a big project page arrive without waiting a
+# round trip for every 64 KB on high latency links
+H2_WINDOW = 16 * 1024 * 1024
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+def isAvailable() -> bool:
+    """Returns `True` if the package `h2` is installed"""
+    return h2 is not None
+
+
+class Http2NotNegotiated(OSError):
+    pass
+
+
+class Http2Response:
+    """Complete response of a stream. It has attributes of urllib3 responses
+    that are read by callers: `status`, `headers`, `data` and `version`"""
+
+    version = 20
+
+    def __init__(self, status: int, headers: HTTPHeaderDict, data: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.data = data
+
+    def release_conn(self):
+        pass
+
+
+class _Stream:
+    def __init__(self, headers: list[tuple[str, str]]) -> None:
+        self.requestHeaders = headers
+        self.status = 0
+        self.headers = HTTPHeaderDict()
+        self.data = bytearray()
+        self.error: Exception | None = None
+        self.done = threading.Event()
+
+    def fail(self, error: Exception):
+        if not self.done.is_set():
+            self.error = error
+            self.done.set()
+
+    def finish(self):
+        data = bytes(self.data)
+        encoding = self.headers.get("content-encoding", "")
+        if encoding == "gzip":
+            data = gzip.decompress(data)
+        elif encoding == "deflate":
+            data = zlib.decompress(data)
+        self.data = bytearray(data)
+        self.done.set()
+
+
+class Http2Connection:
+    """TLS connection to one host that carries any number of requests at
+    once. A single I/O thread owns the socket: it opens streams submitted by
+    requesting threads, reads frames and completes their responses"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        context: ssl.SSLContext,
+        timeout: float = H2_TIMEOUT,
+    ) -> None:
+        self.host = host
+        self.authority = host if port == 443 else f"{host}:{port}"
+        self.timeout = timeout
+
+        raw = socket.create_connection((host, port), timeout=timeout)
+        try:
+            self.sock = context.wrap_socket(raw, server_hostname=host)
+        except BaseException:
+            raw.close()
+            raise
+        if self.sock.selected_alpn_protocol() != "h2":
+            self.sock.close()
+            raise Http2NotNegotiated(f"'{host}' does not support HTTP/2")
+
+        self.conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=True, header_encoding="utf-8")
+        )
+        self.conn.initiate_connection()
+        self.conn.update_settings(
+            {h2.settings.SettingCodes.INITIAL_WINDOW_SIZE: H2_WINDOW}
+        )
+        self.conn.increment_flow_control_window(
+            H2_WINDOW - self.conn.inbound_flow_control_window
+        )
+        self.sock.sendall(self.conn.data_to_send())
+
+        self.closed = False
+        self._lock = threading.Lock()
+        self._pending: list[_Stream] = []
+        self._streams: dict[int, _Stream] = {}
+        self._wakeReader, self._wakeWriter = socket.socketpair()
+        threading.Thread(target=self._run, name=f"h2-{host}", daemon=True).start()
+
+    def request(
+        self, method: str, path: str, headers: dict[str, str]
+    ) -> Http2Response:
+        stream = _Stream(
+            [
+                (":method", method),
+                (":scheme", "https"),
+                (":authority", self.authority),
+                (":path", path),
+            ]
+            + [(name.lower(), value) for name, value in headers.items()]
+        )
+        with self._lock:
+            if self.closed:
+                raise ConnectionError(f"Connection to '{self.host}' is closed")
+            self._pending.append(stream)
+        self._wake()
+
+        if not stream.done.wait(self.timeout):
+            stream.fail(TimeoutError(f"'{self.host}' did not respond in time"))
+        if stream.error is not None:
+            raise stream.error
+        return Http2Response(stream.status, stream.headers, bytes(stream.data))
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeWriter.send(b"\0")
+        except OSError:
+            pass
+
+    def _run(self):
+        try:
+            while True:
+                readable, _, _ = select.select([self.sock, self._wakeReader], [], [])
+                if self._wakeReader in readable:
+                    self._wakeReader.recv(4096)
+                if self.closed:
+                    self.conn.close_connection()
+                    self._flush()
+                    raise ConnectionError(f"Connection to '{self.host}' is closed")
+                self._openStreams()
+                if self.sock in readable:
+                    self._receive()
+                    # Streams closed by the received frames make room for
+                    # requests waiting over `max_concurrent_streams`
+                    self._openStreams()
+                self._flush()
+        except Exception as error:
+            self._shutdown(error)
+
+    def _openStreams(self):
+        with self._lock:
+            limit = self.conn.remote_settings.max_concurrent_streams
+            while self._pending and self.conn.open_outbound_streams < limit:
+                stream = self._pending.pop(0)
+                if stream.done.is_set():
+                    continue
+                streamId = self.conn.get_next_available_stream_id()
+                self.conn.send_headers(streamId, stream.requestHeaders, end_stream=True)
+                self._streams[streamId] = stream
+
+    def _receive(self):
+        data = self.sock.recv(65536)
+        if not data:
+            raise ConnectionError(f"'{self.host}' has closed the connection")
+        # Decrypted bytes left in the TLS buffer are invisible to `select`
+        while self.sock.pending():
+            data += self.sock.recv(self.sock.pending())
+        for event in self.conn.receive_data(data):
+            self._handle(event)
+
+    def _handle(self, event):
+        if isinstance(event, h2.events.ConnectionTerminated):
+            raise ConnectionError(f"'{self.host}' has closed the connection")
+
+        stream = self._streams.get(getattr(event, "stream_id", None))
+        if stream is None:
+            return
+        if isinstance(event, h2.events.ResponseReceived):
+            for name, value in event.headers:
+                if name == ":status":
+                    stream.status = int(value)
+                else:
+                    stream.headers.add(name, value)
+        elif isinstance(event, h2.events.DataReceived):
+            stream.data += event.data
+            self.conn.acknowledge_received_data(
+                event.flow_controlled_length, event.stream_id
+            )
+        elif isinstance(event, h2.events.StreamEnded):
+            del self._streams[event.stream_id]
+            try:
+                stream.finish()
+            except (OSError, zlib.error) as error:
+                stream.fail(error)
+        elif isinstance(event, h2.events.StreamReset):
+            del self._streams[event.stream_id]
+            stream.fail(ConnectionError(f"Stream was reset: {event.error_code!r}"))
+
+    def _flush(self):
+        data = self.conn.data_to_send()
+        if data:
+            self.sock.sendall(data)
+
+    def _shutdown(self, error: Exception):
+        with self._lock:
+            self.closed = True
+            streams = list(self._streams.values()) + self._pending
+            self._streams.clear()
+            self._pending.clear()
+        for stream in streams:
+            stream.fail(error)
+        for sock in (self.sock, self._wakeReader, self._wakeWriter):
+            sock.close()
+
+
+class Http2PoolManager:
+    """Replacement of `PoolManager` that multiplexes plain GET requests of
+    https URLs over HTTP/2. Other requests, like streamed downloads, and
+    hosts without HTTP/2 are served by the HTTP/1.1 `pool`"""
+
+    def __init__(self, pool: urllib3.PoolManager) -> None:
+        self.pool = pool
+        self.context = createSSLContext()
+        self.context.set_alpn_protocols(["h2", "http/1.1"])
+        self._lock = threading.Lock()
+        self._connections: dict[tuple[str, int], Http2Connection] = {}
+        self._http1: set[tuple[str, int]] = set()
+
+    def __getattr__(self, name: str):
+        return getattr(self.pool, name)
+
+    def _connection(self, host: str, port: int) -> Http2Connection | None:
+        """Returns live connection to the host or `None` if it has no HTTP/2"""
+        key = (host, port)
+        with self._lock:
+            if key in self._http1:
+                return None
+            conn = self._connections.get(key)
+            if conn is not None and not conn.closed:
+                POOL_STATS.connection(host, True)
+                return conn
+
+        # Handshake is made without the lock, so a slow host does not hold
+        # back requests to other hosts
+        try:
+            conn = Http2Connection(host, port, self.context)
+        except OSError:
+            with self._lock:
+                self._http1.add(key)
+            return None
+
+        with self._lock:
+            current = self._connections.get(key)
+            if current is not None and not current.closed:
+                # Another thread has connected meanwhile, its connection wins
+                conn.close()
+                POOL_STATS.connection(host, True)
+                return current
+            POOL_STATS.connection(host, False)
+            self._connections[key] = conn
+            return conn
+
+    def _request(self, url: str, headers: dict[str, str]):
+        split = urlsplit(url)
+        conn = self._connection(split.hostname, split.port or 443)
+        if conn is not None:
+            path = split.path or "/"
+            if split.query:
+                path += f"?{split.query}"
+            try:
+                response = conn.request("GET", path, headers)
+            except OSError:
+                # Connection is lost, the next request opens a new one
+                conn.close()
+            else:
+                if response.status not in RETRY_STATUSES:
+                    return response
+                # Failed request is retried with backoff by the HTTP/1.1 pool
+        return self.pool.request("GET", url, headers=headers, redirect=False)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        **kwargs,
+    ):
+        if h2 is None or kwargs or method != "GET" or not url.startswith("https://"):
+            return self.pool.request(method, url, headers=headers, **kwargs)
+
+        for _ in range(MAX_REDIRECTS):
+            response = self._request(url, dict(headers or {}))
+            location = response.headers.get("location")
+            if response.status not in REDIRECT_STATUSES or not location:
+                break
+            url = urljoin(url, location)
+        return response
+
+    def clear(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self.pool.clear()
+
+
+_CLIENT: Http2PoolManager | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def getHttp2PoolManager(pool: urllib3.PoolManager) -> Http2PoolManager:
+    """Returns HTTP/2 client shared by the process that falls back to `pool`"""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT.pool is not pool:
+            if _CLIENT is not None:
+                _CLIENT.clear()
+            _CLIENT = Http2PoolManager(pool)
+        return _CLIENT
@@ -0,0 +1,198 @@
+"""
+This is a part of Python Package Manager
+
+Remote wheel as a seekable file object. Only the parts of the archive that
+are actually read are downloaded with HTTP `Range` requests, so reading the
+zip central directory and `*.dist-info/METADATA` costs a few KB instead of
+the whole wheel
+
+(c) tankalxat34
+"""
+
+import bisect
+import io
+import re
+import zipfile
+from typing import Callable
+
+from . import urllib3
+
+PPM_RANGE_CHUNK = 16 * 1024
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class RangeNotSupported(Exception):
+    """Server does not answer `Range` requests with `206 Partial Content`"""
+
+
+class RangeNeeded(Exception):
+    """Part of `PendingRemoteFile` that has to be downloaded to read on"""
+
+    def __init__(self, byteRange: str) -> None:
+        super().__init__(byteRange)
+        self.byteRange = byteRange
+
+
+class LazyRemoteFile(io.RawIOBase):
+    def __init__(
+        self, pm: urllib3.PoolManager, url: str, chunkSize: int = PPM_RANGE_CHUNK
+    ) -> None:
+        super().__init__()
+        self.pm = pm
+        self.url = url
+        self.chunkSize = chunkSize
+        self.downloaded = 0
+
+        self._pos = 0
+        self._starts: list[int] = []
+        self._blocks: list[bytes] = []
+        self.length = 0
+
+        # The suffix request learns the size of the file and prefetches the
+        # end of archive, where the zip central directory is stored
+        self._fetch(f"-{chunkSize}")
+
+    def _fetch(self, byteRange: str):
+        response = self.pm.request(
+            "GET", self.url, headers=rangeHeaders(byteRange), preload_content=False
+        )
+        try:
+            self.store(
+                response.status,
+                response.headers.get("Content-Range", ""),
+                response.read if response.status == 206 else bytes,
+            )
+        finally:
+            response.release_conn()
+
+    def store(self, status: int, contentRange: str, read: Callable[[], bytes]):
+        """Keep the body of a range response, `read` is called only when the
+        server has answered with a part of the file"""
+        match = _CONTENT_RANGE.match(contentRange)
+        if status != 206 or not match:
+            raise RangeNotSupported(
+                f"Range requests are not supported by '{self.url}'"
+            )
+        data = read()
+
+        self.length = int(match.group(3))
+        self.downloaded += len(data)
+        self._insert(int(match.group(1)), data)
+
+    def _insert(self, start: int, data: bytes):
+        """Store downloaded block merging it with overlapping neighbours"""
+        end = start + len(data)
+        i = bisect.bisect_left(self._starts, start)
+        if i and self._starts[i - 1] + len(self._blocks[i - 1]) >= start:
+            i -= 1
+        j = i
+        while j < len(self._starts) and self._starts[j] <= end:
+            j += 1
+
+        if i < j:
+            first, last = self._starts[i], self._starts[j - 1]
+            merged = bytearray(self._blocks[i][: max(0, start - first)])
+            merged += data
+            tail = last + len(self._blocks[j - 1])
+            if tail > end:
+                merged += self._blocks[j - 1][end - last :]
+            start = min(start, first)
+            data = bytes(merged)
+
+        self._starts[i:j] = [start]
+        self._blocks[i:j] = [data]
+
+    def _missing(self, start: int, end: int) -> list[tuple[int, int]]:
+        """Return ranges between `start` and `end` that were not downloaded"""
+        result: list[tuple[int, int]] = []
+        position = start
+        i = max(0, bisect.bisect_right(self._starts, start) - 1)
+        while position < end:
+            if i < len(self._starts) and self._starts[i] <= position:
+                position = max(position, self._starts[i] + len(self._blocks[i]))
+                i += 1
+                continue
+            nextStart = self._starts[i] if i < len(self._starts) else end
+            result.append((position, min(end, nextStart)))
+            position = nextStart
+        return result
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        start = self._pos
+        end = min(self.length, start + len(buffer))
+        if start >= end:
+            return 0
+
+        for missingStart, missingEnd in self._missing(start, end):
+            missingEnd = min(self.length, max(missingEnd, missingStart + self.chunkSize))
+            self._fetch(f"{missingStart}-{missingEnd - 1}")
+
+        i = bisect.bisect_right(self._starts, start) - 1
+        offset = start - self._starts[i]
+        data = self._blocks[i][offset : offset + end - start]
+        buffer[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+class PendingRemoteFile(LazyRemoteFile):
+    """Remote file for asyncio code that does no I/O itself: reading a part
+    that was not downloaded raises `RangeNeeded`, the caller downloads it,
+    passes the response to `store` and reads again"""
+
+    def __init__(self, url: str, chunkSize: int = PPM_RANGE_CHUNK) -> None:
+        try:
+            super().__init__(None, url, chunkSize)
+        except RangeNeeded:
+            # The caller stores the suffix range before the first read
+            pass
+
+    def _fetch(self, byteRange: str):
+        raise RangeNeeded(byteRange)
+
+
+def rangeHeaders(byteRange: str) -> dict[str, str]:
+    return {"Range": f"bytes={byteRange}", "Accept-Encoding": "identity"}
+
+
+def readWheelMetadata(file: LazyRemoteFile) -> bytes:
+    """Return content of `*.dist-info/METADATA` of the remote wheel"""
+    reader = io.BufferedReader(file, PPM_RANGE_CHUNK)
+    try:
+        with zipfile.ZipFile(reader) as archive:
+            for name in archive.namelist():
+                parts = name.split("/")
+                if (
+                    len(parts) == 2
+                    and parts[0].endswith(".dist-info")
+                    and parts[1] == "METADATA"
+                ):
+                    return archive.read(name)
+    finally:
+        # `file` stays open to be read again when a range was missing
+        reader.detach()
+    raise NameError(f"Wheel '{file.url}' does not contain METADATA")
+
+
+def fetchWheelMetadata(pm: urllib3.PoolManager, url: str) -> bytes:
+    """Return content of `*.dist-info/METADATA` of the remote wheel"""
+    with LazyRemoteFile(pm, url) as file:
+        return readWheelMetadata(file)
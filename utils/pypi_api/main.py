@@ -1,56 +1,430 @@
-from io import BytesIO
+import hashlib
 import json
 import os
 import pathlib
 import sys
+import tempfile
+import time
 import zipfile
+from typing import BinaryIO
 from site import getusersitepackages
 
 
 from . import urllib3
-from .. import config
+from .cache import HttpCache
+from .client import (
+    MISSING_STATUSES,
+    POOL_STATS,
+    RETRY_STATUSES,
+    createRetry,
+    getPoolManager,
+)
+from .lazy_wheel import RangeNotSupported, fetchWheelMetadata
+from .metadata_store import MetadataStore, YankedProject
+from .releases import ReleaseIndex
+from .simple import BDIST_WHEEL, SIMPLE_ACCEPT, DistFile, parseProjectPage
+from .wheel_cache import WheelCache
+from ..cli.main import Cli
+from ..constants import PPM_DOWNLOAD_CHUNK
+from ..package_parser.environment import wheelRank
+from ..package_parser.packaging.metadata import RawMetadata, parse_email
+from ..package_parser.packaging.specifiers import InvalidSpecifier, SpecifierSet
+from ..package_parser.packaging.utils import canonicalize_name
 
 PYPI_JSON = "https://pypi.org/pypi/{name}/json"
 PYPI_VERSION_JSON = "https://pypi.org/pypi/{name}/{version}/json"
+PYPI_SIMPLE = "https://pypi.org/simple/{name}/"
+# Content of `*.dist-info/INSTALLER` of distributions installed by ppm
+INSTALLER = "ppm"
+
+PYTHON_VERSION = ".".join(map(str, sys.version_info[:3]))
+
+HTTP_CACHE = HttpCache()
+WHEEL_CACHE = WheelCache()
+METADATA_STORE = MetadataStore()
+
+
+def _checkDigest(file: DistFile, expected: str | None, actual: str):
+    if expected and expected != actual:
+        raise ValueError(
+            f"Hash mismatch of '{file.filename}': expected sha256 {expected}, got {actual}"
+        )
+
+
+def markInstaller(path: str | pathlib.Path, names: list[str]) -> list[str]:
+    """Write `*.dist-info/INSTALLER` of the unpacked wheel and list it in
+    `RECORD`, so ppm tells its own distributions from the others. Returns
+    `names` with the written file"""
+    distInfo = next(
+        (
+            name.split("/")[0]
+            for name in names
+            if name.split("/")[0].endswith(".dist-info")
+        ),
+        None,
+    )
+    if distInfo is None:
+        return names
+    installer = f"{distInfo}/INSTALLER"
+    pathlib.Path(path, installer).write_text(f"{INSTALLER}\n", encoding="utf-8")
+    if installer in names:
+        return names
+
+    record = pathlib.Path(path, distInfo, "RECORD")
+    content = record.read_text(encoding="utf-8")
+    with open(record, "a", encoding="utf-8") as file:
+        if content and not content.endswith("\n"):
+            file.write("\n")
+        file.write(f"{installer},,\n")
+    return [*names, installer]
 
 
 class PyPi:
-    def __init__(self, packageName: str) -> None:
-        self.pm = urllib3.PoolManager()
+    def __init__(
+        self,
+        packageName: str,
+        cache: HttpCache | None = HTTP_CACHE,
+        wheelCache: WheelCache | None = WHEEL_CACHE,
+        pm: urllib3.PoolManager | None = None,
+        store: MetadataStore | None = METADATA_STORE,
+    ) -> None:
+        self.pm = pm or getPoolManager()
         self.name = packageName
+        self.cache = cache
+        self.wheelCache = wheelCache
+        self.store = store
+        self.bytesDownloaded = 0
 
         self.json = dict()
+        self.files: list[DistFile] = []
+        self._releaseIndexes: dict[bool, ReleaseIndex] = {}
 
-    def upackArchive(self, iobytes: BytesIO, path: str | pathlib.Path):
-        """Unpack archive that represented as wheel (`*.zip`)"""
+    def upackArchive(self, iobytes: BinaryIO, path: str | pathlib.Path) -> list[str]:
+        """Unpack archive that represented as wheel (`*.zip`). Returns names of
+        unpacked files"""
         with zipfile.ZipFile(iobytes, "r") as archive:
-            for file in archive.namelist():
+            names = archive.namelist()
+            for file in names:
                 archive.extract(file, path)
+        return markInstaller(path, names)
+
+    def _get(self, url: str, headers: dict[str, str] | None = None) -> bytes:
+        """Return body of `url` using cached response when it is possible"""
+        entry = self.cache.get(url) if self.cache else None
+        if entry and entry.isFresh(self.cache.ttl):
+            return entry.body
+
+        headers = dict(headers or {})
+        if entry:
+            headers.update(entry.conditionalHeaders())
+        started = time.perf_counter()
+        response = self.pm.request("GET", url, headers=headers or None)
+        POOL_STATS.request(
+            urllib3.util.parse_url(url).host,
+            response.version,
+            time.perf_counter() - started,
+        )
+        if response.status == 304 and entry:
+            return self.cache.refresh(url, entry, response.headers).body
+        if response.status == 404:
+            raise NameError(f"Package '{self.name}' was not found on PyPi")
+        if response.status in RETRY_STATUSES:
+            raise ConnectionError(f"Index responded {response.status} to '{url}'")
+        if self.cache and response.status == 200:
+            self.cache.store(url, response.data, response.headers)
+        return response.data
 
     def fetch(self):
         """Needs to perform before any action"""
         url = PYPI_JSON.format(name=self.name)
-        self.json = json.loads(self.pm.request("GET", url).data)
+        self.json = json.loads(self._get(url))
         return self.json
 
-    def releases(self) -> list[str]:
+    def _fetchFiles(self, url: str) -> list[DistFile]:
+        files = parseProjectPage(self._get(url, {"Accept": SIMPLE_ACCEPT}), url)
+        if not files:
+            raise NameError(f"Package '{self.name}' has no files on PyPi")
+        if all(file.yanked for file in files):
+            raise YankedProject(self.name, files)
+        return files
+
+    def fetchSimple(self, allowYanked: bool = False) -> list[DistFile]:
+        """Lightweight alternative to `fetch` that uses the Simple API (PEP 691)
+        and keeps only compact records of files. A project whose every file
+        is yanked raises `YankedProject` unless `allowYanked`"""
+        url = PYPI_SIMPLE.format(name=canonicalize_name(self.name))
+        self._releaseIndexes.clear()
+        try:
+            if self.store is None:
+                self.files = self._fetchFiles(url)
+            else:
+                self.files = self.store.get(url, lambda: self._fetchFiles(url))
+        except YankedProject as error:
+            if not allowYanked:
+                raise
+            self.files = error.files
+        return self.files
+
+    @staticmethod
+    def isCompatible(file: DistFile) -> bool:
+        """Return `True` if `Requires-Python` of `file` matches current interpreter"""
+        if not file.requires_python:
+            return True
+        try:
+            return SpecifierSet(file.requires_python).contains(
+                PYTHON_VERSION, prereleases=True
+            )
+        except InvalidSpecifier:
+            return True
+
+    def releases(self, includeYanked: bool = False) -> list[str]:
         """Return the list of existing versions"""
-        releasesObjects: list[str] = self.json["releases"]
-        return releasesObjects
+        if not self.files:
+            releasesObjects: list[str] = self.json["releases"]
+            return releasesObjects
+        return [str(version) for version in self.releaseIndex(includeYanked)]
+
+    def releaseIndex(self, includeYanked: bool = False) -> ReleaseIndex:
+        """Return sorted index of versions that have files compatible with
+        the running Python. It is built once per fetched project page"""
+        if includeYanked in self._releaseIndexes:
+            return self._releaseIndexes[includeYanked]
+        if not self.files:
+            index = ReleaseIndex(self.json["releases"])
+            self._releaseIndexes[includeYanked] = index
+            return index
+
+        compatible: dict[str | None, bool] = {}
+        versions: set[str] = set()
+        for file in self.files:
+            if file.version in versions or (file.yanked and not includeYanked):
+                continue
+            if file.requires_python not in compatible:
+                compatible[file.requires_python] = self.isCompatible(file)
+            if compatible[file.requires_python]:
+                versions.add(file.version)
+
+        index = ReleaseIndex(versions)
+        self._releaseIndexes[includeYanked] = index
+        return index
+
+    def getFiles(self, version: str = "") -> list[DistFile]:
+        """Return files of `version` or of the latest version"""
+        if not self.files:
+            parentObj = (
+                self.json["urls"] if not version else self.json["releases"].get(version)
+            )
+            files: list[DistFile] = []
+            for obj in parentObj or []:
+                try:
+                    files.append(DistFile.fromJson(obj, PYPI_JSON))
+                except ValueError:
+                    pass
+            return files
 
-    def fetchArchive(self, version: str = ""):
-        """Return `BytesIO` of archive"""
-        parentObj = (
-            self.json["urls"] if not version else self.json["releases"].get(version)
+        version = version or self.releases()[-1]
+        return [file for file in self.files if file.version == version]
+
+    def fetchCoreMetadata(self, file: DistFile) -> RawMetadata:
+        """Fetch and parse standalone core metadata file of `file` (PEP 658)"""
+        data = self._get(file.metadataUrl)
+        if isinstance(file.core_metadata, dict) and "sha256" in file.core_metadata:
+            if hashlib.sha256(data).hexdigest() != file.core_metadata["sha256"]:
+                raise ValueError(f"Hash mismatch of metadata '{file.metadataUrl}'")
+        raw, _ = parse_email(data)
+        return raw
+
+    def fetchWheelMetadata(self, file: DistFile) -> RawMetadata:
+        """Read `METADATA` of remote wheel using HTTP range requests"""
+        # Content of a published wheel never changes, so the extracted
+        # metadata is cached at PEP 658 URL without regard to TTL
+        entry = self.cache.get(file.metadataUrl) if self.cache else None
+        if entry:
+            data = entry.body
+        else:
+            data = fetchWheelMetadata(self.pm, file.url)
+            if self.cache:
+                self.cache.store(file.metadataUrl, data, {})
+        raw, _ = parse_email(data)
+        return raw
+
+    def _metadataSource(
+        self, version: str
+    ) -> tuple[DistFile | None, DistFile | None]:
+        """Return file of `version` with standalone metadata (PEP 658) and
+        the wheel to read metadata from when there is no such file"""
+        files = sorted(self.getFiles(version), key=lambda f: f.packagetype != BDIST_WHEEL)
+        for file in files:
+            if file.core_metadata:
+                return file, None
+
+        try:
+            return None, self.selectWheel(version)
+        except NameError:
+            pass
+        wheels = [file for file in files if file.packagetype == BDIST_WHEEL]
+        return None, wheels[0] if wheels else None
+
+    def fetchMetadata(self, version: str) -> RawMetadata:
+        """Return core metadata of `version` without downloading its files"""
+        coreFile, wheel = self._metadataSource(version)
+        if coreFile is not None:
+            return self.fetchCoreMetadata(coreFile)
+        if wheel is not None:
+            try:
+                return self.fetchWheelMetadata(wheel)
+            except RangeNotSupported:
+                pass
+        raise NameError(f"Metadata of '{self.name}=={version}' is not served by index")
+
+    def fetchRequiresDist(self, version: str) -> list[str]:
+        """Return `Requires-Dist` of the given `version`"""
+        if self.store is None:
+            return self._fetchRequiresDist(version)
+        return self.store.get(
+            ("requires-dist", canonicalize_name(self.name), version),
+            lambda: self._fetchRequiresDist(version),
         )
-        for obj in parentObj:
-            if obj["packagetype"] == "bdist_wheel" and "whl" in obj["url"]:
-                print("  Fetching wheel", f"'{parentObj[0]['filename']}'")
-                return BytesIO(self.pm.request("GET", parentObj[0]["url"]).data)
-        raise NameError("Link to download wheel not found")
+
+    def _fetchRequiresDist(self, version: str) -> list[str]:
+        try:
+            return self.fetchMetadata(version).get("requires_dist", [])
+        except NameError:
+            pass
+
+        try:
+            url = PYPI_VERSION_JSON.format(name=self.name, version=version)
+            info = json.loads(self._get(url))["info"]
+        except NameError:
+            # Index does not serve JSON of a single release, project JSON
+            # describes only the latest one
+            info = (self.json or self.fetch())["info"]
+            if info["version"] != version:
+                raise
+        return info["requires_dist"] or []
+
+    def selectWheel(self, version: str = "") -> DistFile:
+        """Return the wheel of `version` whose tags have the best priority for
+        the running interpreter"""
+        best: DistFile | None = None
+        bestRank: int | None = None
+        for file in self.getFiles(version):
+            if file.packagetype != BDIST_WHEEL or not self.isCompatible(file):
+                continue
+            rank = wheelRank(file.filename)
+            if rank is not None and (bestRank is None or rank < bestRank):
+                best, bestRank = file, rank
+        if best is None:
+            raise NameError(
+                f"Link to download wheel of '{self.name}=={version}' compatible with this platform not found"
+            )
+        return best
+
+    def hasWheel(self, version: str) -> bool:
+        """Return `True` if `version` has a wheel compatible with this platform"""
+        try:
+            self.selectWheel(version)
+        except NameError:
+            return False
+        return True
+
+    def fetchArchive(self, version: str = "") -> BinaryIO:
+        """Return opened file of archive"""
+        return self.downloadFile(self.selectWheel(version))
+
+    def _stream(self, url: str, target: BinaryIO) -> str:
+        """Write response body of `url` to `target` chunk by chunk.
+        Returns sha256 digest of written content.
+
+        When the connection breaks in the middle of the body, the download
+        goes on from the received byte after a backoff"""
+        sha256 = hashlib.sha256()
+        retries = createRetry()
+        written = 0
+        while True:
+            headers = {"Range": f"bytes={written}-"} if written else None
+            response = self.pm.request(
+                "GET", url, headers=headers, preload_content=False
+            )
+            try:
+                if written and response.status == 200:
+                    # Index ignored the range, the download starts over
+                    target.seek(0)
+                    target.truncate()
+                    sha256 = hashlib.sha256()
+                    written = 0
+                elif response.status != (206 if written else 200) or (
+                    written
+                    and not response.headers.get("Content-Range", "").startswith(
+                        f"bytes {written}-"
+                    )
+                ):
+                    if response.status in MISSING_STATUSES:
+                        raise NameError(
+                            f"Failed to download '{url}', status {response.status}"
+                        )
+                    # Throttling, outage of the index or a broken range are not
+                    # a problem of the release, the install has to stop
+                    raise ConnectionError(
+                        f"Failed to download '{url}', status {response.status}"
+                    )
+                for chunk in response.stream(PPM_DOWNLOAD_CHUNK):
+                    sha256.update(chunk)
+                    target.write(chunk)
+                    written += len(chunk)
+                    self.bytesDownloaded += len(chunk)
+                return sha256.hexdigest()
+            except (
+                urllib3.exceptions.ProtocolError,
+                urllib3.exceptions.ReadTimeoutError,
+            ) as error:
+                response.release_conn()
+                try:
+                    retries = retries.increment("GET", url, error=error)
+                except urllib3.exceptions.MaxRetryError:
+                    raise error
+                retries.sleep()
+            finally:
+                response.release_conn()
+
+    def downloadFile(self, file: DistFile) -> BinaryIO:
+        """Return opened `file` taken from wheel cache or downloaded from the index.
+
+        Response is streamed to disk and hashed on the fly, so memory usage
+        does not depend on the size of the wheel and a corrupted download is
+        rejected before extraction"""
+        digest = file.hashes.get("sha256")
+        if digest and self.wheelCache:
+            cached = self.wheelCache.get(digest)
+            if cached is not None:
+                Cli.stdout(f"Using cached wheel '{file.filename}'", level=1)
+                return cached
+
+        Cli.stdout(f"Fetching wheel '{file.filename}'", level=1)
+        if not (digest and self.wheelCache):
+            target = tempfile.TemporaryFile()
+            try:
+                actual = self._stream(file.url, target)
+                _checkDigest(file, digest, actual)
+            except BaseException:
+                target.close()
+                raise
+            target.seek(0)
+            return target
+
+        tempPath = self.wheelCache.tempPath(digest)
+        try:
+            with open(tempPath, "wb") as target:
+                actual = self._stream(file.url, target)
+            _checkDigest(file, digest, actual)
+        except BaseException:
+            pathlib.Path(tempPath).unlink(missing_ok=True)
+            raise
+        return self.wheelCache.commit(tempPath, digest)
 
     def setup(self, path: str | pathlib.Path, version: str = ""):
-        return self.upackArchive(self.fetchArchive(version), path)
+        with self.fetchArchive(version) as archive:
+            return self.upackArchive(archive, path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+"""
+This is a part of Python Package Manager
+
+Session store of index metadata. The same project pages and `Requires-Dist`
+are asked for again and again in one process: by every resolve of the
+interactive shell, by `ppm sync` that locks before it installs, by
+`ppm upgrade` that reinstalls. The store keeps parsed results in memory,
+so they are fetched and parsed once per session:
+
+    - concurrent requests for the same key wait for one shared future
+      instead of fetching it in parallel;
+    - `NameError`, a project or release missing on the index, is kept like
+      a result (negative entry) and is not asked for again;
+    - other errors reach the requests that wait for them and are
+      forgotten, the next request fetches again
+
+Entries live for `ttl` seconds, so a long session sees new releases
+
+(c) tankalxat34
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from .simple import DistFile
+from ..constants import PPM_METADATA_TTL
+
+T = TypeVar("T")
+
+
+class YankedProject(NameError):
+    """Every file of the project is yanked. A yanked release may be
+    installed only when it is pinned exactly (PEP 592), so the files are
+    kept for that case"""
+
+    def __init__(self, name: str, files: list[DistFile]) -> None:
+        super().__init__(f"Package '{name}' has only yanked releases on PyPi")
+        self.files = files
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class MetadataStore:
+    def __init__(self, ttl: float = PPM_METADATA_TTL) -> None:
+        self.ttl = ttl
+        self.fetched = 0
+        self.reused = 0
+        self.missing = 0
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, tuple[float, Future]] = {}
+
+    def _claim(self, key: Hashable) -> tuple[Future, bool]:
+        """Return future of `key` and `True` when the caller has to fetch it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, future = entry
+                if not future.done() or time.monotonic() - created < self.ttl:
+                    self.reused += 1
+                    if future.done() and isinstance(future.exception(), NameError):
+                        self.missing += 1
+                    return future, False
+            future = Future()
+            self._entries[key] = (time.monotonic(), future)
+            self.fetched += 1
+            return future, True
+
+    def _fail(self, key: Hashable, future: Future, error: BaseException):
+        if not isinstance(error, NameError):
+            with self._lock:
+                if self._entries.get(key, (0, None))[1] is future:
+                    del self._entries[key]
+        if isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # Fetch was interrupted, the waiting requests fetch again
+            future.cancel()
+
+    def get(self, key: Hashable, fetch: Callable[[], T]) -> T:
+        """Return value of `key`, `fetch` is called once per session"""
+        while True:
+            future, owner = self._claim(key)
+            if owner:
+                try:
+                    result = fetch()
+                except BaseException as error:
+                    self._fail(key, future, error)
+                    raise
+                future.set_result(result)
+                return result
+            try:
+                return future.result()
+            except CancelledError:
+                continue
+
+    async def getAsync(self, key: Hashable, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Coroutine version of `get`. A cancelled request that waits for
+        another one leaves the shared fetch running"""
+        loop = asyncio.get_running_loop()
+        while True:
+            future, owner = self._claim(key)
+            if owner:
+                try:
+                    result = await fetch()
+                except BaseException as error:
+                    self._fail(key, future, error)
+                    raise
+                future.set_result(result)
+                return result
+
+            waiter = loop.create_future()
+            future.add_done_callback(
+                lambda _: loop.call_soon_threadsafe(_wake, waiter)
+            )
+            await waiter
+            if not future.cancelled():
+                return future.result()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self) -> str:
+        return (
+            f"{self.fetched} fetched, {self.reused} reused in this session "
+            f"({self.missing} known to be missing)"
+        )
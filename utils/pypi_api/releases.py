@@ -0,0 +1,72 @@
+"""
+This is a part of Python Package Manager
+
+Releases of one project parsed once and sorted by `Version`. A specifier
+set is compiled to intervals of versions it can match, so the search of
+the newest matching release bisects into these intervals instead of a
+linear scan that parses every release string again
+
+(c) tankalxat34
+"""
+
+import bisect
+from typing import Iterable, Iterator
+
+from ..package_parser.packaging.specifiers import SpecifierSet
+from ..package_parser.packaging.version import InvalidVersion, Version
+
+
+class ReleaseIndex:
+    def __init__(self, versions: Iterable[str | Version]) -> None:
+        parsed: set[Version] = set()
+        for version in versions:
+            try:
+                parsed.add(
+                    version if isinstance(version, Version) else Version(version)
+                )
+            except InvalidVersion:
+                pass
+        self.versions: list[Version] = sorted(parsed)
+        self._keys = [version._key for version in self.versions]
+
+    def __len__(self) -> int:
+        return len(self.versions)
+
+    def __iter__(self) -> Iterator[Version]:
+        return iter(self.versions)
+
+    def _indexes(self, specifier: SpecifierSet) -> list[int]:
+        """Return indexes of releases within intervals of `specifier`, newest first"""
+        indexes: list[int] = []
+        for low, lowClosed, high, highClosed in reversed(list(specifier.intervals)):
+            if lowClosed:
+                start = bisect.bisect_left(self._keys, low)
+            else:
+                start = bisect.bisect_right(self._keys, low)
+            if highClosed:
+                stop = bisect.bisect_right(self._keys, high)
+            else:
+                stop = bisect.bisect_left(self._keys, high)
+            indexes.extend(range(stop - 1, start - 1, -1))
+        return indexes
+
+    def candidates(self, specifier: SpecifierSet) -> Iterator[Version]:
+        """Yield releases matching `specifier`, newest first. As in
+        `SpecifierSet.filter` pre-releases are yielded only when the
+        specifier allows them or nothing else matches"""
+        indexes = self._indexes(specifier)
+        found = False
+        for i in indexes:
+            if specifier.contains(self.versions[i]):
+                found = True
+                yield self.versions[i]
+        if found or specifier.prereleases:
+            return
+        for i in indexes:
+            version = self.versions[i]
+            if version.is_prerelease and specifier.contains(version, prereleases=True):
+                yield version
+
+    def best(self, specifier: SpecifierSet) -> Version | None:
+        """Return the newest release matching `specifier`"""
+        return next(self.candidates(specifier), None)
@@ -0,0 +1,180 @@
+"""
+This is a part of Python Package Manager
+
+Client side of the Simple Repository API. Project pages are requested as
+JSON (PEP 691) with a fallback to HTML (PEP 503) for indexes that do not
+support it. Only a compact record is kept for every file, so the parsed
+page does not hold release descriptions or unused fields in memory
+
+(c) tankalxat34
+"""
+
+from html.parser import HTMLParser
+import json
+from urllib.parse import urljoin, urldefrag
+
+from utils.package_parser.packaging.utils import (
+    parse_sdist_filename,
+    parse_wheel_filename,
+)
+
+SIMPLE_ACCEPT = "application/vnd.pypi.simple.v1+json, text/html;q=0.01"
+
+BDIST_WHEEL = "bdist_wheel"
+SDIST = "sdist"
+
+
+class DistFile:
+    """Compact record of a single file of the project"""
+
+    __slots__ = (
+        "filename",
+        "url",
+        "hashes",
+        "requires_python",
+        "yanked",
+        "size",
+        "core_metadata",
+        "version",
+        "packagetype",
+    )
+
+    def __init__(
+        self,
+        filename: str,
+        url: str,
+        hashes: dict[str, str],
+        requires_python: str | None = None,
+        yanked: bool | str = False,
+        size: int | None = None,
+        core_metadata: bool | dict[str, str] = False,
+    ) -> None:
+        self.filename = filename
+        self.url = url
+        self.hashes = hashes
+        self.requires_python = requires_python or None
+        self.yanked = yanked
+        self.size = size
+        self.core_metadata = core_metadata
+
+        if filename.endswith(".whl"):
+            self.packagetype = BDIST_WHEEL
+            self.version = str(parse_wheel_filename(filename)[1])
+        else:
+            self.packagetype = SDIST
+            self.version = str(parse_sdist_filename(filename)[1])
+
+    @classmethod
+    def fromJson(cls, obj: dict, baseUrl: str = "") -> "DistFile":
+        """Create from file object of PyPI JSON API (`urls` and `releases`)"""
+        return cls(
+            obj["filename"],
+            urljoin(baseUrl, obj["url"]),
+            obj.get("digests") or {},
+            obj.get("requires_python"),
+            (obj.get("yanked_reason") or True) if obj.get("yanked") else False,
+            obj.get("size"),
+        )
+
+    @classmethod
+    def fromSimpleJson(cls, obj: dict, baseUrl: str = "") -> "DistFile":
+        """Create from file object of project page in JSON format (PEP 691)"""
+        return cls(
+            obj["filename"],
+            urljoin(baseUrl, obj["url"]),
+            obj.get("hashes") or {},
+            obj.get("requires-python"),
+            obj.get("yanked") or False,
+            obj.get("size"),
+            obj.get("core-metadata", obj.get("dist-info-metadata")) or False,
+        )
+
+    @property
+    def metadataUrl(self) -> str:
+        """URL of the core metadata file of this distribution (PEP 658)"""
+        return self.url + ".metadata"
+
+    def __repr__(self) -> str:
+        return f"<DistFile {self.filename}>"
+
+
+def _parseMetadataAttribute(value: str | None) -> bool | dict[str, str]:
+    """Parse `data-core-metadata` attribute, which is either `true` or
+    `<hashname>=<hashvalue>`"""
+    if value is None:
+        return False
+    if "=" in value:
+        algorithm, digest = value.split("=", 1)
+        return {algorithm: digest}
+    return value.lower() != "false"
+
+
+class _SimpleHtmlParser(HTMLParser):
+    def __init__(self, baseUrl: str) -> None:
+        super().__init__()
+        self.baseUrl = baseUrl
+        self.files: list[DistFile] = []
+        self._anchor: dict[str, str | None] | None = None
+        self._text = ""
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "base":
+            href = dict(attrs).get("href")
+            if href:
+                self.baseUrl = urljoin(self.baseUrl, href)
+        elif tag == "a":
+            self._anchor = dict(attrs)
+            self._text = ""
+
+    def handle_data(self, data):
+        if self._anchor is not None:
+            self._text += data
+
+    def handle_endtag(self, tag):
+        if tag != "a" or self._anchor is None:
+            return
+        anchor, self._anchor = self._anchor, None
+        if not anchor.get("href"):
+            return
+
+        url, fragment = urldefrag(urljoin(self.baseUrl, anchor["href"]))
+        hashes: dict[str, str] = {}
+        if "=" in fragment:
+            algorithm, digest = fragment.split("=", 1)
+            hashes[algorithm] = digest
+
+        yanked = anchor.get("data-yanked")
+        try:
+            self.files.append(
+                DistFile(
+                    self._text.strip() or url.rsplit("/", 1)[-1],
+                    url,
+                    hashes,
+                    anchor.get("data-requires-python"),
+                    (yanked or True) if yanked is not None else False,
+                    core_metadata=_parseMetadataAttribute(
+                        anchor.get(
+                            "data-core-metadata", anchor.get("data-dist-info-metadata")
+                        )
+                    ),
+                )
+            )
+        except ValueError:
+            pass
+
+
+def parseProjectPage(body: bytes, url: str) -> list[DistFile]:
+    """Return files of the project page `url` in JSON or HTML format"""
+    if body.lstrip()[:1] == b"{":
+        files: list[DistFile] = []
+        for obj in json.loads(body)["files"]:
+            try:
+                files.append(DistFile.fromSimpleJson(obj, url))
+            except ValueError:
+                pass
+        return files
+
+    parser = _SimpleHtmlParser(url)
+    parser.feed(body.decode("utf-8", errors="replace"))
+    parser.close()
+    return parser.files
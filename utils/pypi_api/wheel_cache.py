@@ -0,0 +1,101 @@
+"""
+This is a part of Python Package Manager
+
+Local cache of downloaded wheels shared by all projects and venvs.
+Entries are addressed by sha256 digest published by the index, so the same
+file is never downloaded twice. Wheels are verified while they are
+downloaded, before they are committed, so hits are not hashed again.
+Total size of the cache is limited, least
+recently used entries are evicted first
+
+(c) tankalxat34
+"""
+
+import os
+import pathlib
+import threading
+from typing import BinaryIO
+
+from utils.constants import PPM_CACHE_PATH, PPM_WHEEL_CACHE_SIZE
+
+# Dir of wheels that are being written, it is not a shard of entries
+TEMP_DIR = "tmp"
+
+
+class WheelCache:
+    def __init__(
+        self,
+        path: str | pathlib.Path = pathlib.Path(PPM_CACHE_PATH, "wheels"),
+        maxSize: int = PPM_WHEEL_CACHE_SIZE,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.maxSize = maxSize
+        self._lock = threading.Lock()
+
+    def _entryPath(self, digest: str) -> pathlib.Path:
+        return pathlib.Path(self.path, digest[:2], digest[2:])
+
+    def get(self, digest: str) -> BinaryIO | None:
+        """Return opened wheel with sha256 `digest` if it is cached"""
+        path = self._entryPath(digest)
+        try:
+            file = open(path, "rb")
+        except OSError:
+            return None
+
+        try:
+            # Modification time is used as the time of the last access
+            os.utime(path)
+        except OSError:
+            # The entry is evicted by another process, it is a miss
+            file.close()
+            return None
+        return file
+
+    def tempPath(self, digest: str) -> pathlib.Path:
+        """Return path where the wheel with sha256 `digest` can be written
+        before it is committed to the cache. Such files are kept apart from
+        entries, so eviction never takes a file that is still written"""
+        temp = pathlib.Path(self.path, TEMP_DIR)
+        temp.mkdir(parents=True, exist_ok=True)
+        return pathlib.Path(temp, f"{digest}.{os.getpid()}.{threading.get_ident()}")
+
+    def commit(self, tempPath: str | pathlib.Path, digest: str) -> BinaryIO:
+        """Move written and verified wheel with sha256 `digest` into the cache"""
+        path = self._entryPath(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tempPath, path)
+        file = open(path, "rb")
+        self.evict(keep=path)
+        return file
+
+    def size(self) -> int:
+        """Return total size of cached wheels in bytes"""
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self) -> list[os.DirEntry]:
+        entries: list[os.DirEntry] = []
+        if not self.path.exists():
+            return entries
+        for shard in os.scandir(self.path):
+            if shard.is_dir() and shard.name != TEMP_DIR:
+                entries.extend(entry for entry in os.scandir(shard) if entry.is_file())
+        return entries
+
+    def evict(self, keep: str | pathlib.Path | None = None):
+        """Remove least recently used wheels until the cache fits `maxSize`.
+        The entry at `keep`, a wheel just committed, is never removed"""
+        keep = os.path.abspath(keep) if keep is not None else None
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+            total = sum(entry.stat().st_size for entry in entries)
+            for entry in entries:
+                if total <= self.maxSize:
+                    break
+                if os.path.abspath(entry.path) == keep:
+                    continue
+                total -= entry.stat().st_size
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
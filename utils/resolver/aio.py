@@ -0,0 +1,125 @@
+"""
+This is a part of Python Package Manager
+
+Resolver for asyncio applications. The search is the one of `Resolver`,
+only project pages and metadata are fetched by tasks of the running event
+loop instead of a pool of threads. When a step of the search needs a
+result that has not arrived yet, the step is left unchanged, the task is
+awaited and the step is made again
+
+(c) tankalxat34
+"""
+
+import asyncio
+import pathlib
+
+from utils.package_parser.packaging.requirements import Requirement
+from utils.package_parser.packaging.utils import canonicalize_name
+from utils.pypi_api.aio import AsyncPyPi
+from utils.pypi_api.async_client import AsyncHttpClient, getAsyncClient
+from utils.pypi_api.cache import HttpCache
+from utils.pypi_api.main import HTTP_CACHE, METADATA_STORE, WHEEL_CACHE
+from utils.pypi_api.metadata_store import MetadataStore
+from utils.pypi_api.wheel_cache import WheelCache
+from .main import Candidate, Literal, Resolver
+
+
+class _Pending(BaseException):
+    """Result of a task is needed before the step can go on. It is not an
+    `Exception`, so handlers of fetch errors inside the step let it pass"""
+
+    def __init__(self, task: asyncio.Task) -> None:
+        super().__init__()
+        self.task = task
+
+
+class _TaskFuture:
+    """Task with `result` of `concurrent.futures.Future` used by the search"""
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+
+    def result(self):
+        if not self.task.done():
+            raise _Pending(self.task)
+        return self.task.result()
+
+
+class AsyncResolver(Resolver):
+    def __init__(
+        self,
+        sitePath: str | pathlib.Path,
+        withDeps: bool = True,
+        cache: HttpCache | None = HTTP_CACHE,
+        wheelCache: WheelCache | None = WHEEL_CACHE,
+        client: AsyncHttpClient | None = None,
+        pinInstalled: bool = True,
+        store: MetadataStore | None = METADATA_STORE,
+    ) -> None:
+        self.client = client or getAsyncClient()
+        super().__init__(
+            sitePath,
+            withDeps=withDeps,
+            maxWorkers=self.client.maxsize,
+            cache=cache,
+            wheelCache=wheelCache,
+            pinInstalled=pinInstalled,
+            store=store,
+        )
+
+    async def _fetchProject(self, requirement: Requirement) -> AsyncPyPi:
+        pypi = AsyncPyPi(
+            requirement.name,
+            cache=self.cache,
+            wheelCache=self.wheelCache,
+            client=self.client,
+            store=self.store,
+        )
+        await pypi.fetchSimple(allowYanked=self._isPinned(requirement))
+        if self.withDeps:
+            version = next(self._versions(pypi, requirement.specifier), None)
+            if version is not None:
+                self._requiresDist(pypi, version)
+        return pypi
+
+    def _project(self, requirement: Requirement) -> _TaskFuture:
+        name = canonicalize_name(requirement.name)
+        if name not in self._projects:
+            self._projects[name] = _TaskFuture(
+                asyncio.ensure_future(self._fetchProject(requirement))
+            )
+        return self._projects[name]
+
+    def _requiresDist(self, pypi: AsyncPyPi, version: str) -> _TaskFuture:
+        literal: Literal = (canonicalize_name(pypi.name), version)
+        if literal not in self._requires:
+            self._requires[literal] = _TaskFuture(
+                asyncio.ensure_future(pypi.fetchRequiresDist(version))
+            )
+        return self._requires[literal]
+
+    async def resolve(self, requirements: list[Requirement]) -> list[Candidate]:
+        """Return install plan for `requirements` and their dependencies.
+
+        Conflicts and errors of the top-level requirements are raised,
+        broken dependencies are reported and skipped"""
+        try:
+            self._begin(requirements)
+            while True:
+                try:
+                    if not self._step():
+                        return self._plan()
+                except _Pending as pending:
+                    await asyncio.wait([pending.task])
+        finally:
+            # Fetches ahead for abandoned choices are cancelled
+            tasks = [
+                future.task
+                for future in (*self._projects.values(), *self._requires.values())
+            ]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for futures in (self._projects, self._requires):
+                for key in [key for key, f in futures.items() if f.task.cancelled()]:
+                    del futures[key]
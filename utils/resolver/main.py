@@ -0,0 +1,465 @@
+"""
+This is a part of Python Package Manager
+
+Resolution stage of `ppm install`. Versions are chosen by a backtracking
+search with conflict-driven learning in the spirit of PubGrub:
+
+    - a version is decided only when it satisfies requirements of every
+      decided dependent and its own requirements accept decided packages;
+    - when no version of a package is left, the decisions that caused it
+      are learned as a nogood, a combination of versions that can not be
+      installed together, and the search jumps back to the latest of them
+      instead of retrying every choice made after it
+
+Project pages and metadata of packages discovered by a decision are
+fetched ahead by a bounded pool of workers while the search goes on.
+Nothing is written to the site-packages dir until the full install plan
+is known
+
+(c) tankalxat34
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import pathlib
+import threading
+from typing import Iterator
+
+from utils.cli.main import Cli, Prefix
+from utils.constants import PPM_MAX_WORKERS, convertPackageName
+from utils.package_parser.environment import evaluateMarker
+from utils.package_parser.main import PackageParser
+from utils.package_parser.packaging.requirements import InvalidRequirement, Requirement
+from utils.package_parser.packaging.specifiers import SpecifierSet
+from utils.package_parser.packaging.utils import canonicalize_name
+from utils.pypi_api.cache import HttpCache
+from utils.pypi_api import urllib3
+from utils.pypi_api.client import getPoolManager
+from utils.pypi_api.main import HTTP_CACHE, METADATA_STORE, WHEEL_CACHE, PyPi
+from utils.pypi_api.metadata_store import MetadataStore
+from utils.pypi_api.wheel_cache import WheelCache
+
+# Decision `(name, version)`, name is canonicalized
+Literal = tuple[str, str]
+# Errors that show a project or release is broken. Other errors, like an
+# unreachable index, are raised: skipping would give a partial environment
+METADATA_ERRORS = (NameError, ValueError, InvalidRequirement)
+
+
+class Candidate:
+    """Package pinned to the version that will be installed"""
+
+    def __init__(
+        self, requirement: Requirement, pypi: PyPi, version: str, depth: int = 0
+    ) -> None:
+        self.requirement = requirement
+        self.pypi = pypi
+        self.version = version
+        self.depth = depth
+        self.requiresDist: list[str] = []
+
+    @property
+    def name(self) -> str:
+        return self.pypi.name
+
+    def __repr__(self) -> str:
+        return f"<Candidate {self.name}=={self.version}>"
+
+
+class Constraint:
+    """Requirement on a package and decisions that imposed it. Requirements
+    given by user have no cause"""
+
+    def __init__(
+        self,
+        requirement: Requirement,
+        cause: frozenset[Literal] = frozenset(),
+        depth: int = 0,
+    ) -> None:
+        self.requirement = requirement
+        self.cause = cause
+        self.depth = depth
+
+    def __repr__(self) -> str:
+        return f"<Constraint {self.requirement} by {sorted(self.cause)}>"
+
+
+class Resolver:
+    def __init__(
+        self,
+        sitePath: str | pathlib.Path,
+        withDeps: bool = True,
+        maxWorkers: int = PPM_MAX_WORKERS,
+        cache: HttpCache | None = HTTP_CACHE,
+        wheelCache: WheelCache | None = WHEEL_CACHE,
+        pm: urllib3.PoolManager | None = None,
+        pinInstalled: bool = True,
+        store: MetadataStore | None = METADATA_STORE,
+    ) -> None:
+        self.path = sitePath
+        self.withDeps = withDeps
+        self.pinInstalled = pinInstalled
+        self.maxWorkers = maxWorkers
+        self.cache = cache
+        self.wheelCache = wheelCache
+        self.store = store
+        self.pm = pm or getPoolManager()
+
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._projects: dict[str, Future] = {}
+        self._requires: dict[Literal, Future] = {}
+
+    def _installedVersion(self, name: str) -> str | None:
+        if not self.pinInstalled:
+            return None
+        try:
+            parser = PackageParser(self.path, convertPackageName(name.lower()))
+            return parser.getVersion()
+        except Exception:
+            return None
+
+    @staticmethod
+    def _isPinned(requirement: Requirement) -> bool:
+        """Return `True` if `requirement` pins an exact version, only then a
+        project whose every release is yanked can be installed (PEP 592)"""
+        return any(
+            spec.operator == "==="
+            or (spec.operator == "==" and not spec.version.endswith(".*"))
+            for spec in requirement.specifier
+        )
+
+    def _fetchProject(self, requirement: Requirement) -> PyPi:
+        pypi = PyPi(
+            requirement.name,
+            cache=self.cache,
+            wheelCache=self.wheelCache,
+            pm=self.pm,
+            store=self.store,
+        )
+        pypi.fetchSimple(allowYanked=self._isPinned(requirement))
+        if self.withDeps:
+            # Metadata of the most likely choice is fetched ahead of the search
+            version = next(self._versions(pypi, requirement.specifier), None)
+            if version is not None:
+                self._requiresDist(pypi, version)
+        return pypi
+
+    def _project(self, requirement: Requirement) -> Future:
+        """Return future of the fetched project page of `requirement`"""
+        name = canonicalize_name(requirement.name)
+        with self._lock:
+            if name not in self._projects:
+                self._projects[name] = self._executor.submit(
+                    self._fetchProject, requirement
+                )
+            return self._projects[name]
+
+    def _requiresDist(self, pypi: PyPi, version: str) -> Future:
+        """Return future of `Requires-Dist` of the given release"""
+        literal = (canonicalize_name(pypi.name), version)
+        with self._lock:
+            if literal not in self._requires:
+                self._requires[literal] = self._executor.submit(
+                    pypi.fetchRequiresDist, version
+                )
+            return self._requires[literal]
+
+    @staticmethod
+    def _versions(pypi: PyPi, specifier: SpecifierSet) -> Iterator[str]:
+        """Yield releases matching `specifier` that have a wheel for this
+        platform, newest first. Yanked releases are yielded only when
+        nothing else matches (PEP 592)"""
+        for includeYanked in (False, True):
+            found = False
+            for version in pypi.releaseIndex(includeYanked).candidates(specifier):
+                if pypi.hasWheel(str(version)):
+                    found = True
+                    yield str(version)
+            if found:
+                return
+
+    def _dependencies(
+        self, name: str, version: str, extras: set[str]
+    ) -> list[Requirement]:
+        """Return requirements of the release whose markers match `extras`"""
+        pypi: PyPi = self._projects[name].result()
+        result: list[Requirement] = []
+        for req_dist in self._requiresDist(pypi, version).result():
+            child_requirement = Requirement(req_dist)
+
+            if (not bool(child_requirement.marker)) or any(
+                evaluateMarker(child_requirement.marker, extra)
+                for extra in ["", *sorted(extras)]
+            ):
+                result.append(child_requirement)
+        return result
+
+    def _constrain(self, constraint: Constraint) -> frozenset[Literal] | None:
+        """Add `constraint`. Returns conflict if it rejects decided version"""
+        requirement = constraint.requirement
+        name = canonicalize_name(requirement.name)
+        if name not in self._constraints:
+            self._constraints[name] = []
+            self._order.append(name)
+        self._constraints[name].append(constraint)
+
+        if name not in self._installed:
+            self._installed[name] = self._installedVersion(name)
+            if self._installed[name]:
+                Cli.stdout(
+                    f"Package '{requirement.name}' has been skipped because it's installed before",
+                    prefix=Prefix.INFO,
+                )
+            else:
+                Cli.stdout(f"Collecting '{requirement}'")
+                self._project(requirement)
+
+        if name not in self._assigned:
+            return None
+
+        literal = (name, self._assigned[name])
+        if not requirement.specifier.contains(literal[1], prereleases=True):
+            return constraint.cause | {literal}
+
+        extras = set(requirement.extras) - self._extras[name]
+        if not extras or not self.withDeps or self._installed[name]:
+            return None
+
+        # Decided package is required with new extras, their requirements
+        # are imposed by both decisions
+        self._extras[name] |= extras
+        cause = constraint.cause | {literal}
+        for dependency in self._dependencies(name, literal[1], extras):
+            child = Constraint(dependency, cause, constraint.depth + 1)
+            conflict = self._constrain(child)
+            if conflict is not None:
+                return conflict
+        return None
+
+    def _excluded(self, literal: Literal) -> frozenset[Literal] | None:
+        """Return decisions which together with `literal` make a nogood"""
+        for nogood in self._nogoods:
+            if literal in nogood and all(
+                self._assigned.get(name) == version
+                for name, version in nogood
+                if (name, version) != literal
+            ):
+                return nogood - {literal}
+        return None
+
+    def _rejection(self, dependencies: list[Requirement]) -> frozenset[Literal] | None:
+        """Return decision that is not accepted by `dependencies`"""
+        for requirement in dependencies:
+            name = canonicalize_name(requirement.name)
+            if name in self._assigned and not requirement.specifier.contains(
+                self._assigned[name], prereleases=True
+            ):
+                return frozenset({(name, self._assigned[name])})
+        return None
+
+    @staticmethod
+    def _emptyIntersection(constraints: list[Constraint]) -> frozenset[Literal] | None:
+        """Return causes of constraints that no version can satisfy at once.
+        The smallest pair is looked for first to learn a precise nogood"""
+        intervals = [c.requirement.specifier.intervals for c in constraints]
+        for i, constraint in enumerate(constraints):
+            if intervals[i].is_empty():
+                return constraint.cause
+            for j in range(i):
+                if (intervals[i] & intervals[j]).is_empty():
+                    return constraint.cause | constraints[j].cause
+
+        combined = intervals[0] if intervals else None
+        for interval in intervals[1:]:
+            combined &= interval
+        if combined is not None and combined.is_empty():
+            return frozenset().union(*(c.cause for c in constraints))
+        return None
+
+    def _skip(self, name: str, error: Exception):
+        """Skip broken dependency, errors of requirements given by user are raised"""
+        if any(not c.depth for c in self._constraints[name]):
+            raise error
+        Cli.stdout(
+            f"Dependency '{name}' has been skipped: {error}",
+            prefix=Prefix.WARGING,
+            level=1,
+        )
+        self._skipped.add(name)
+
+    def _choose(self, name: str) -> tuple[str | None, frozenset[Literal] | None]:
+        """Return the newest acceptable version of `name` or the conflict
+        that explains why there is no such version"""
+        constraints = self._constraints[name]
+        conflict = self._emptyIntersection(constraints)
+        if conflict is not None:
+            return None, conflict
+
+        specifier = SpecifierSet()
+        for constraint in constraints:
+            specifier &= constraint.requirement.specifier
+        conflict = frozenset().union(*(c.cause for c in constraints))
+
+        installed = self._installed[name]
+        if installed:
+            versions = []
+            if specifier.contains(installed, prereleases=True):
+                versions.append(installed)
+        else:
+            try:
+                pypi: PyPi = self._project(constraints[0].requirement).result()
+            except METADATA_ERRORS as error:
+                self._skip(name, error)
+                return None, None
+            if next(self._versions(pypi, SpecifierSet()), None) is None:
+                self._skip(
+                    name, NameError(f"No compatible wheel found for '{pypi.name}'")
+                )
+                return None, None
+            versions = self._versions(pypi, specifier)
+
+        self._rejected[name] = 0
+        for version in versions:
+            literal = (name, version)
+            excluded = self._excluded(literal)
+            if excluded is None and self.withDeps and not installed:
+                extras = set().union(*(c.requirement.extras for c in constraints))
+                try:
+                    dependencies = self._dependencies(name, version, extras)
+                except METADATA_ERRORS as error:
+                    if literal not in self._broken:
+                        self._broken.add(literal)
+                        Cli.stdout(
+                            f"Release '{name}=={version}' has been skipped: {error}",
+                            prefix=Prefix.WARGING,
+                            level=1,
+                        )
+                    continue
+                excluded = self._rejection(dependencies)
+            if excluded is None:
+                return version, None
+            self._rejected[name] += 1
+            conflict |= excluded
+        return None, conflict
+
+    def _decide(self, name: str, version: str) -> frozenset[Literal] | None:
+        """Pin `name` to `version` and impose its requirements"""
+        literal = (name, version)
+        constraints = self._constraints[name]
+        extras = set().union(*(c.requirement.extras for c in constraints))
+        dependencies: list[Requirement] = []
+        if self.withDeps and not self._installed[name]:
+            dependencies = self._dependencies(name, version, extras)
+
+        self._assigned[name] = version
+        self._decisions.append(literal)
+        self._extras[name] = extras
+        depth = min(c.depth for c in constraints) + 1
+        for dependency in dependencies:
+            child = Constraint(dependency, frozenset({literal}), depth)
+            conflict = self._constrain(child)
+            if conflict is not None:
+                return conflict
+        return None
+
+    def _backjump(self, conflict: frozenset[Literal]):
+        """Undo decisions since the latest one of `conflict`"""
+        level = max(self._decisions.index(literal) for literal in conflict)
+        undone = set(self._decisions[level:])
+        for name, _ in self._decisions[level:]:
+            del self._assigned[name]
+            del self._extras[name]
+        del self._decisions[level:]
+
+        for constraints in self._constraints.values():
+            constraints[:] = [c for c in constraints if not c.cause & undone]
+
+    def _explain(self, name: str) -> str:
+        required = ", ".join(f"'{c.requirement}'" for c in self._constraints[name])
+        reason = f"No version of '{name}' satisfies {required}"
+        if self._installed.get(name):
+            reason += f", installed version is {self._installed[name]}"
+        if self._rejected.get(name):
+            reason += (
+                ", every matching version conflicts with requirements of other packages"
+            )
+        return reason
+
+    def _next(self) -> str | None:
+        """Return the next package to decide, breadth-first"""
+        for name in self._order:
+            if (
+                name not in self._assigned
+                and name not in self._skipped
+                and self._constraints[name]
+            ):
+                return name
+        return None
+
+    def _plan(self) -> list[Candidate]:
+        plan: list[Candidate] = []
+        for name, version in self._decisions:
+            if self._installed[name]:
+                continue
+            constraint = min(self._constraints[name], key=lambda c: c.depth)
+            candidate = Candidate(
+                constraint.requirement,
+                self._projects[name].result(),
+                version,
+                constraint.depth,
+            )
+            if self.withDeps:
+                candidate.requiresDist = self._requires[(name, version)].result()
+            plan.append(candidate)
+        return plan
+
+    def _begin(self, requirements: list[Requirement]):
+        self._constraints: dict[str, list[Constraint]] = {}
+        self._order: list[str] = []
+        self._installed: dict[str, str | None] = {}
+        self._decisions: list[Literal] = []
+        self._assigned: dict[str, str] = {}
+        self._extras: dict[str, set[str]] = {}
+        self._nogoods: list[frozenset[Literal]] = []
+        self._rejected: dict[str, int] = {}
+        self._skipped: set[str] = set()
+        self._broken: set[Literal] = set()
+
+        for requirement in requirements:
+            self._constrain(Constraint(requirement))
+
+    def _step(self) -> bool:
+        """Decide the next package or jump back from a conflict. Returns
+        `False` when every package is decided"""
+        name = self._next()
+        if name is None:
+            return False
+        version, conflict = self._choose(name)
+        if version is not None:
+            conflict = self._decide(name, version)
+            if conflict is None:
+                return True
+        elif conflict is None:
+            return True
+
+        if not conflict:
+            raise ValueError(self._explain(name))
+        self._nogoods.append(conflict)
+        self._backjump(conflict)
+        return True
+
+    def resolve(self, requirements: list[Requirement]) -> list[Candidate]:
+        """Return install plan for `requirements` and their dependencies.
+
+        Conflicts and errors of the top-level requirements are raised,
+        broken dependencies are reported and skipped"""
+        self._executor = ThreadPoolExecutor(max_workers=self.maxWorkers)
+        try:
+            self._begin(requirements)
+            while self._step():
+                pass
+            return self._plan()
+        finally:
+            # Metadata fetched ahead for abandoned choices is not waited for
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None